@@ -0,0 +1,87 @@
+import argparse
+import glob
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from main import ENGINES, configure_logging, save_result, solve
+
+
+def read_teams(templates: str):
+    # Returns the template path of each team. templates is a directory, where each json file
+    # is the template of a team named after the file, or a manifest json file like
+    # {"team-a": "./teams/a.json", "team-b": "./teams/b.json"}
+    if os.path.isdir(templates):
+        return {os.path.splitext(os.path.basename(path))[0]: path
+                for path in sorted(glob.glob(os.path.join(templates, "*.json")))}
+
+    with open(templates, "r") as f:
+        manifest = json.load(f)
+    directory = os.path.dirname(templates)
+    return {team: os.path.join(directory, path) for team, path in manifest.items()}
+
+
+def run_team(team: str, template: str, engine: str, output_dir: str):
+    # Solves the template of a team in a worker process, the team already runs
+    # in parallel with the others so it does not use islands
+    logging.getLogger().setLevel(logging.WARNING)
+    with open(template, "r") as f:
+        config = json.load(f)
+    # The checkpoint file would be shared by the teams, the metrics and the profile
+    # of each team are written on output_dir
+    config.update({"islands": 1, "checkpointInterval": 0})
+    for key in ["metrics", "profile"]:
+        if config.get(key):
+            config[key] = os.path.join(output_dir, f"{key}-{team}{os.path.splitext(config[key])[1]}")
+
+    engine, best_population, best_invalid_population, seconds = solve(config, engine)
+    name = f"result-{team}.csv"
+    save_result(config, best_population, best_invalid_population, name, output_dir)
+    population = best_population or best_invalid_population
+    return {
+        "team": team,
+        "score": None if population is None else float(population.score),
+        "valid": best_population is not None,
+        "seconds": seconds,
+        "epochs": engine.epochs,
+        "stop_reason": engine.stop_reason,
+        "result": None if population is None else os.path.join(output_dir,
+                                                                name if best_population else f"invalid-{name}")
+    }
+
+
+def run_batch(teams: dict, engine: str, output_dir: str, workers: int):
+    os.makedirs(output_dir, exist_ok=True)
+    summary = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_team, team, template, engine, output_dir): team
+                   for team, template in teams.items()}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"team: {futures[future]} - failed: {e}")
+                result = {"team": futures[future], "score": None, "valid": False, "seconds": None, "epochs": None,
+                          "stop_reason": None, "result": None, "error": str(e)}
+            else:
+                score = "-" if result["score"] is None else f"{result['score']:.2f}"
+                logging.info(f"team: {result['team']} - score: {score} - valid: {result['valid']} "
+                             f"- time: {result['seconds']:.2f}s - epochs: {result['epochs']}")
+            summary.append(result)
+    return sorted(summary, key=lambda r: r["team"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solves the templates of many teams in parallel")
+    parser.add_argument("templates", help="directory with a template per team or a manifest json file")
+    parser.add_argument("--engine", choices=ENGINES.keys(), help="engine used to find the schedules")
+    parser.add_argument("--output-dir", default="./resources", help="directory of the result files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of teams solved in parallel")
+    args = parser.parse_args()
+
+    configure_logging()
+    summary = run_batch(read_teams(args.templates), args.engine, args.output_dir, args.workers)
+    with open(os.path.join(args.output_dir, "summary.json"), "w") as f:
+        f.write(json.dumps(summary, indent=2))
+    logging.info(f"summary saved on {os.path.join(args.output_dir, 'summary.json')}")
@@ -0,0 +1,200 @@
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+
+from evaluation.batch_evaluation import FITNESS_CACHE_SIZE, WEEK_CACHE_SIZE
+from generation import Generation
+from main import configure_logging, map_on_call_not_possible
+
+# Default cases: (weekQuantity, number of employees, numberOfEmployeesDoingOnCall, unavailability density)
+CASES = [
+    (4, 3, 2, 0.0),
+    (6, 5, 2, 0.1),
+    (13, 10, 2, 0.1),
+    (26, 20, 3, 0.1),
+    (52, 50, 3, 0.2),
+    (104, 200, 5, 0.2)
+]
+
+# Startup cases: code run by a fresh interpreter, measured by run_startup_benchmark
+STARTUP_CASES = {
+    "main": "import main",
+    "main template": "import main; main.create_parser().parse_args(['template', '--start-date', '01/01/2024', "
+                     "'--weeks', '1'])",
+    "main solve": "import main; main.load_engine('genetic')",
+    "pdf_writer": "import pdf_writer",
+    "pdf_writer pdf": "import pdf_writer; import pypdf",
+    "batch": "import batch",
+    "service": "import service"
+}
+HEAVY_MODULES = ["numpy", "pandas", "pypdf", "ortools"]
+
+
+def create_synthetic_template(week_quantity: int, employees: int, number_of_employees_doing_on_call: int,
+                              density: float, seed: int, number_of_populations=40, number_of_epochs=50,
+                              fitness_cache_size=FITNESS_CACHE_SIZE, week_cache_size=WEEK_CACHE_SIZE):
+    # Creates a template like ./resources/template.json, every employee has the probability
+    # density of not being available on each day
+    rng = random.Random(seed)
+    start_date = date(2024, 1, 1)
+    employee_names = [f"employee-{index}" for index in range(employees)]
+    config = {
+        "weekQuantity": week_quantity,
+        "numberOfPopulations": number_of_populations,
+        "numberOfEpochs": number_of_epochs,
+        "numberOfEmployeesDoingOnCall": number_of_employees_doing_on_call,
+        "employeeNames": employee_names,
+        "fitnessCacheSize": fitness_cache_size,
+        "weekCacheSize": week_cache_size,
+        "startDate": start_date.strftime("%d/%m/%Y")
+    }
+    for days in range(7 * week_quantity):
+        config[(start_date + timedelta(days=days)).strftime("%d/%m/%Y")] = ",".join(
+            e for e in employee_names if rng.random() < density)
+    return config
+
+
+def run_case(config: dict, seed: int):
+    # Runs the GA on a template in a fresh process and returns its measurements
+    logging.getLogger().setLevel(logging.WARNING)
+    random.seed(seed)
+
+    start = time.perf_counter()
+    on_call_not_possible = map_on_call_not_possible(config)
+    generation = Generation.create_generation(config["numberOfPopulations"], config["numberOfEmployeesDoingOnCall"],
+                                              [e.lower() for e in config["employeeNames"]], config["weekQuantity"],
+                                              on_call_not_possible, fitness_cache_size=config["fitnessCacheSize"],
+                                              week_cache_size=config["weekCacheSize"])
+    setup_seconds = time.perf_counter() - start
+
+    evaluation_seconds = 0.0
+    evaluated = 0
+    first_valid_epoch = None
+    best_population = None
+    start = time.perf_counter()
+    while generation.epoch < config["numberOfEpochs"]:
+        evaluation_start = time.perf_counter()
+        best_population = generation.get_best_population()
+        evaluation_seconds += time.perf_counter() - evaluation_start
+        evaluated += len(generation.populations)
+        if first_valid_epoch is None and not best_population.invalid:
+            first_valid_epoch = generation.epoch
+        if not best_population.invalid and best_population.score >= 100:
+            break
+        generation.next_generation()
+    run_seconds = time.perf_counter() - start
+
+    return {
+        "weekQuantity": config["weekQuantity"],
+        "employees": len(config["employeeNames"]),
+        "numberOfEmployeesDoingOnCall": config["numberOfEmployeesDoingOnCall"],
+        "numberOfPopulations": config["numberOfPopulations"],
+        "seed": seed,
+        "epochs": evaluated // config["numberOfPopulations"],
+        "setup_seconds": setup_seconds,
+        "run_seconds": run_seconds,
+        "evaluated": evaluated,
+        "evaluated_per_second": evaluated / evaluation_seconds,
+        "evaluation_seconds": generation.batch_evaluation.timings,
+        "cache": generation.batch_evaluation.cache_stats(),
+        "first_valid_epoch": first_valid_epoch,
+        "score": float(best_population.score),
+        "invalid": best_population.invalid,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_memory_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def run_benchmark(cases: list, seed: int, number_of_populations: int, number_of_epochs: int,
+                  fitness_cache_size=FITNESS_CACHE_SIZE, week_cache_size=WEEK_CACHE_SIZE):
+    results = []
+    for index, (week_quantity, employees, number_of_employees_doing_on_call, density) in enumerate(cases):
+        case_seed = seed + index
+        config = create_synthetic_template(week_quantity, employees, number_of_employees_doing_on_call, density,
+                                           case_seed, number_of_populations, number_of_epochs, fitness_cache_size,
+                                           week_cache_size)
+        # Every case runs in a new process, so the peak memory of a case is not affected by the others
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            result = executor.submit(run_case, config, case_seed).result()
+        result["density"] = density
+        results.append(result)
+        logging.info(f"weeks: {week_quantity} - employees: {employees} - on-call: {number_of_employees_doing_on_call} "
+                     f"- density: {density} - evaluated/s: {result['evaluated_per_second']:.0f} "
+                     f"- first valid epoch: {result['first_valid_epoch']} - score: {result['score']:.2f}")
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "seed": seed,
+        "cases": results
+    }
+
+
+def measure_startup(code: str):
+    # Runs code on a new interpreter and returns its seconds and the heavy modules it imported
+    script = (f"import time; start = time.perf_counter(); {code}; seconds = time.perf_counter() - start; "
+              f"import json, sys; print(json.dumps([seconds, [m for m in {HEAVY_MODULES} if m in sys.modules]]))")
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.splitlines()[-1])
+
+
+def run_startup_benchmark(repeat: int):
+    # Measures the import time of each entry point, the median of repeat runs
+    results = []
+    for name, code in STARTUP_CASES.items():
+        runs = [measure_startup(code) for _ in range(repeat)]
+        result = {"case": name, "seconds": statistics.median(r[0] for r in runs), "modules": runs[-1][1]}
+        results.append(result)
+        logging.info(f"case: {name} - import time: {result['seconds'] * 1000:.0f}ms - "
+                     f"heavy modules: {', '.join(result['modules']) or '-'}")
+    return {
+        "python": platform.python_version(),
+        "repeat": repeat,
+        "startup": results
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the GA throughput and convergence")
+    parser.add_argument("--weeks", type=int, nargs="+", help="weekQuantity values, combined with the other values")
+    parser.add_argument("--employees", type=int, nargs="+", help="number of employees")
+    parser.add_argument("--on-call", type=int, nargs="+", help="numberOfEmployeesDoingOnCall values")
+    parser.add_argument("--density", type=float, nargs="+", help="probability of an employee being unavailable")
+    parser.add_argument("--populations", type=int, default=40, help="numberOfPopulations")
+    parser.add_argument("--epochs", type=int, default=50, help="numberOfEpochs")
+    parser.add_argument("--fitness-cache", type=int, default=FITNESS_CACHE_SIZE, help="fitnessCacheSize, 0 disables it")
+    parser.add_argument("--week-cache", type=int, default=WEEK_CACHE_SIZE, help="weekCacheSize, 0 disables it")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="./resources/benchmark.json")
+    parser.add_argument("--startup", type=int, metavar="REPEAT",
+                        help="measure the import time of the entry points instead, the median of REPEAT runs")
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.startup:
+        report = run_startup_benchmark(args.startup)
+        with open(args.output, "w") as f:
+            f.write(json.dumps(report, indent=2))
+        logging.info(f"benchmark saved on {args.output}")
+        sys.exit()
+    if args.weeks or args.employees or args.on_call or args.density:
+        cases = list(itertools.product(args.weeks or [6], args.employees or [5], args.on_call or [2],
+                                       args.density or [0.1]))
+    else:
+        cases = CASES
+    report = run_benchmark(cases, args.seed, args.populations, args.epochs, args.fitness_cache, args.week_cache)
+    with open(args.output, "w") as f:
+        f.write(json.dumps(report, indent=2))
+    logging.info(f"benchmark saved on {args.output}")
@@ -0,0 +1,25 @@
+import numpy as np
+
+
+class Codebook:
+    # Maps the employee names to the integer ids stored in the schedules.
+    # The empty slot ("") is encoded as len(employees) and the slots a day does not have
+    # (padding, decoded as None) as len(employees) + 1, see main.map_on_call_slots.
+    # It is shared by every population of a generation
+    def __init__(self, employees: list):
+        self.employees = employees
+        self.blank = len(employees)
+        self.padding = len(employees) + 1
+        self.ids = {employee: index for index, employee in enumerate(employees)}
+        self.ids[""] = self.blank
+        self.ids[None] = self.padding
+        self.names = np.array(employees + ["", None], dtype=object)
+        self.dtype = np.int8 if self.padding <= np.iinfo(np.int8).max else np.int16
+
+    def encode(self, schedule: list):
+        # Returns a (day x slot) array with the ids of the names in schedule
+        return np.array([[self.ids[e] for e in day] for day in schedule], dtype=self.dtype)
+
+    def decode(self, schedule: np.ndarray):
+        # Returns a (day x slot) array with the names of the ids in schedule
+        return self.names[schedule]
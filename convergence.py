@@ -0,0 +1,94 @@
+import logging
+import time
+
+import numpy as np
+
+TARGET_SCORE = "target score"
+STAGNATION = "stagnation"
+TIME_LIMIT = "time limit"
+EPOCHS = "epochs"
+
+
+class Convergence:
+    # Decides when a run stops before its number of epochs: a valid schedule reaches target_score,
+    # the best schedule does not improve for stagnation_epochs or time_limit seconds pass.
+    # Every stall_epochs without improvement the mutation rate is multiplied by mutation_boost
+    # (up to max_mutation_rate), it goes back to the base rate when the best schedule improves.
+    # A stagnation_epochs, time_limit or stall_epochs of 0 disables the rule
+    def __init__(self, target_score=100, stagnation_epochs=0, time_limit=0, stall_epochs=0, mutation_boost=1.5,
+                 max_mutation_rate=1.0):
+        self.target_score = target_score
+        self.stagnation_epochs = stagnation_epochs
+        self.time_limit = time_limit
+        self.stall_epochs = stall_epochs
+        self.mutation_boost = mutation_boost
+        self.max_mutation_rate = max_mutation_rate
+        self.best = None
+        self.best_epoch = 0
+        self.epochs_without_improvement = 0
+        self.start = None
+        self.stop_reason = None
+
+    def begin(self):
+        # Starts the clock of time_limit, a resumed run keeps the first start
+        if self.start is None:
+            self.start = time.perf_counter()
+
+    def update(self, epoch: int, population, best_population=None):
+        # Receives the best population of the epoch and the best valid population so far,
+        # it can be called every few epochs. Returns the reason to stop or None to continue
+        key = None if population is None else (not population.invalid, population.score)
+        if self.best is None or (key is not None and key > self.best):
+            self.best = key
+            self.best_epoch = epoch
+        self.epochs_without_improvement = epoch - self.best_epoch
+
+        if best_population is not None and best_population.score >= self.target_score:
+            return TARGET_SCORE
+        if self.stagnation_epochs and self.epochs_without_improvement >= self.stagnation_epochs:
+            return STAGNATION
+        if self.time_limit and time.perf_counter() - self.start >= self.time_limit:
+            return TIME_LIMIT
+        return None
+
+    def stop(self, reason: str, epoch: int):
+        # Called once when the run stops, by the reason of update or by EPOCHS
+        self.stop_reason = reason
+        logging.info(f"stopped on epoch {epoch} by {reason}")
+
+    def for_island(self):
+        # Returns the convergence of an island, it adapts the mutation rate of the island and stops it
+        # on the target score. The stagnation and the time limit are checked by run_islands
+        return Convergence(target_score=self.target_score, stall_epochs=self.stall_epochs,
+                           mutation_boost=self.mutation_boost, max_mutation_rate=self.max_mutation_rate)
+
+    def state(self):
+        # The progress saved on the checkpoints (see Generation.save_checkpoint), the clock is saved as
+        # the seconds already run so the time limit goes on when the run is resumed
+        return {
+            "best": np.array([np.nan, np.nan] if self.best is None else self.best, dtype=float),
+            "best_epoch": np.array(self.best_epoch),
+            "epochs_without_improvement": np.array(self.epochs_without_improvement),
+            "elapsed": np.array(0.0 if self.start is None else time.perf_counter() - self.start)
+        }
+
+    def restore(self, state: dict):
+        best = state["best"]
+        self.best = None if np.isnan(best).any() else (bool(best[0]), float(best[1]))
+        self.best_epoch = int(state["best_epoch"])
+        self.epochs_without_improvement = int(state["epochs_without_improvement"])
+        self.start = time.perf_counter() - float(state["elapsed"])
+
+    def mutation_rate(self, base_mutation_rate: float):
+        if not self.stall_epochs:
+            return base_mutation_rate
+        boosts = self.epochs_without_improvement // self.stall_epochs
+        return min(base_mutation_rate * self.mutation_boost ** boosts, max(base_mutation_rate, self.max_mutation_rate))
+
+    @staticmethod
+    def from_config(config: dict):
+        return Convergence(target_score=config.get("targetScore", 100),
+                           stagnation_epochs=config.get("stagnationEpochs", 0),
+                           time_limit=config.get("timeLimit", 0),
+                           stall_epochs=config.get("stallEpochs", 0),
+                           mutation_boost=config.get("mutationBoost", 1.5))
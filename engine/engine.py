@@ -0,0 +1,24 @@
+import numpy as np
+
+
+class Engine:
+    def __init__(self, config: dict, employees: list, on_call_not_possible, resume=False, fixed_schedule=None,
+                 fixed_days=None, slots=None):
+        self.config = config
+        self.employees = employees
+        self.on_call_not_possible = on_call_not_possible
+        # Employees doing on-call on each day (see main.map_on_call_slots), the schedule has max(slots) slots
+        self.slots = slots if slots is not None else np.full(on_call_not_possible.shape[0],
+                                                             config["numberOfEmployeesDoingOnCall"], dtype=np.int64)
+        self.resume = resume
+        # The schedule keeps the ids of fixed_schedule on fixed_days (see replan.py)
+        self.fixed_schedule = fixed_schedule
+        self.fixed_days = fixed_days
+        # Number of epochs run by solve, when the engine has epochs
+        self.epochs = None
+        # Why solve stopped, when the engine has a convergence rule
+        self.stop_reason = None
+
+    def solve(self):
+        # Returns the best valid and the best invalid populations found
+        pass
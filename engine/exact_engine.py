@@ -0,0 +1,111 @@
+import logging
+import os
+
+import numpy as np
+
+from codebook import Codebook
+from engine.engine import Engine
+from evaluation.batch_evaluation import BatchEvaluation
+from population import Population
+
+
+class ExactEngine(Engine):
+    # Solves the same rules of the evaluations with the CP-SAT solver of OR-Tools.
+    # It either proves that there is no valid schedule or returns the optimal one
+    # (or the best one found in solverTimeLimit seconds)
+    def solve(self):
+        from ortools.sat.python import cp_model
+
+        if self.config.get("history"):
+            logging.warning("the history is only used by the genetic engine")
+        days, employees = self.on_call_not_possible.shape
+        weeks = -(-days // 7)
+
+        model = cp_model.CpModel()
+        on_call = [[model.NewBoolVar(f"on_call_{day}_{employee}") for employee in range(employees)]
+                   for day in range(days)]
+        for day in range(days):
+            # The fixed days keep the employees of the fixed schedule
+            if self.fixed_days is not None and self.fixed_days[day]:
+                fixed_employees = set(self.fixed_schedule[day].tolist())
+                for employee in range(employees):
+                    model.Add(on_call[day][employee] == int(employee in fixed_employees))
+                continue
+            available = int((~self.on_call_not_possible[day]).sum())
+            # Employees not available cannot do on-call (OnCallPossibleEvaluation)
+            for employee in np.flatnonzero(self.on_call_not_possible[day]):
+                model.Add(on_call[day][employee] == 0)
+            # Each day has its number of different employees doing on-call (DuplicateEmployeeEvaluation)
+            model.Add(sum(on_call[day]) == min(int(self.slots[day]), available))
+
+        # Nobody does on-call on 8 of 9 days in a row (MoreThan7DaysEvaluation)
+        for employee in range(employees):
+            for start in range(max(1, days - 8)):
+                model.Add(sum(on_call[day][employee] for day in range(start, min(start + 9, days))) <= 7)
+
+        # The difference between the employee doing on-call the most and the least days
+        # should not be higher than 5 and everybody does on-call (EmployeeQuantityEvaluation)
+        totals = [sum(on_call[day][employee] for day in range(days)) for employee in range(employees)]
+        highest = model.NewIntVar(0, days, "highest")
+        lowest = model.NewIntVar(0, days, "lowest")
+        model.AddMaxEquality(highest, totals)
+        model.AddMinEquality(lowest, totals)
+        excess = model.NewIntVar(0, days, "excess")
+        model.Add(excess >= highest - lowest - 5)
+        missing = [model.NewBoolVar(f"missing_{employee}") for employee in range(employees)]
+        for employee in range(employees):
+            model.Add(totals[employee] >= 1).OnlyEnforceIf(missing[employee].Not())
+
+        # The same employees should do on-call on the whole week (EmployeeOfWeekEvaluation)
+        of_week = [[model.NewBoolVar(f"of_week_{week}_{employee}") for employee in range(employees)]
+                   for week in range(weeks)]
+        for day in range(days):
+            for employee in range(employees):
+                model.AddImplication(on_call[day][employee], of_week[day // 7][employee])
+
+        # The weights follow the max score of each evaluation, one point of EmployeeQuantityEvaluation
+        # is worth the slots of the template and one employee more in a week costs at least one day (17 / slots)
+        cells = int(self.slots.sum())
+        model.Minimize(cells * (excess + 16 * sum(missing)) + 17 * sum(sum(week) for week in of_week))
+
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = self.config.get("solverTimeLimit", 60)
+        solver.parameters.num_search_workers = os.cpu_count()
+        if self.config.get("seed") is not None:
+            solver.parameters.random_seed = self.config["seed"]
+        status = solver.Solve(model)
+        logging.info(f"exact engine status: {solver.StatusName(status)} - objective: {solver.ObjectiveValue():.0f} "
+                     f"- wall time: {solver.WallTime():.2f}s")
+        if status == cp_model.INFEASIBLE:
+            logging.info("There is no valid schedule for the template")
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return None, None
+
+        codebook = Codebook(self.employees)
+        schedule = self._assign_slots([[solver.Value(on_call[day][employee]) for employee in range(employees)]
+                                       for day in range(days)], self.slots, codebook)
+        if self.fixed_days is not None:
+            schedule[self.fixed_days] = self.fixed_schedule[self.fixed_days]
+        population = Population(schedule, self.on_call_not_possible, codebook=codebook)
+        BatchEvaluation(codebook, self.on_call_not_possible).evaluate([population])
+        if population.invalid:
+            return None, population
+        return population, None
+
+    @staticmethod
+    def _assign_slots(on_call: list, slots: np.ndarray, codebook: Codebook):
+        # Puts the employees of each day in slots, the slots a day does not have are padding.
+        # An employee stays in the slot of the previous day, so the slots are stable for EmployeeOfWeekEvaluation
+        schedule = np.full((len(on_call), int(slots.max())), codebook.blank, dtype=codebook.dtype)
+        schedule[np.arange(schedule.shape[1]) >= slots[:len(on_call)].reshape(-1, 1)] = codebook.padding
+        for day, employees_of_day in enumerate(on_call):
+            employees = [employee for employee, value in enumerate(employees_of_day) if value]
+            if day > 0:
+                for slot, employee in enumerate(schedule[day - 1][:slots[day]]):
+                    if employee in employees:
+                        schedule[day, slot] = employee
+                        employees.remove(employee)
+            for slot in np.flatnonzero(schedule[day] == codebook.blank):
+                if employees:
+                    schedule[day, slot] = employees.pop(0)
+        return schedule
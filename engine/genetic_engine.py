@@ -0,0 +1,92 @@
+import logging
+
+from convergence import Convergence
+from engine.engine import Engine
+from evaluation.batch_evaluation import FITNESS_CACHE_SIZE, WEEK_CACHE_SIZE
+from generation import Generation
+from history import History
+from islands import run_islands
+from local_search import TEMPERATURE, LocalSearch
+from metrics import Metrics
+
+CHECKPOINT = "./resources/checkpoint.npz"
+CACHE_DIR = "./resources/cache"
+
+
+class GeneticEngine(Engine):
+    def solve(self):
+        generation_args = {
+            "number_of_populations": self.config["numberOfPopulations"],
+            "number_of_employees_doing_on_call": int(self.slots.max()),
+            "employees": self.employees,
+            "week_quantity": self.config["weekQuantity"],
+            "on_call_not_possible": self.on_call_not_possible,
+            "selection": self.config.get("selection", "tournament"),
+            "tournament_size": self.config.get("tournamentSize", 3),
+            "elitism": self.config.get("elitism", 2),
+            "mutation_rate": self.config.get("mutationRate", 0.2),
+            "fitness_cache_size": self.config.get("fitnessCacheSize", FITNESS_CACHE_SIZE),
+            "week_cache_size": self.config.get("weekCacheSize", WEEK_CACHE_SIZE),
+            "history": History.from_config(self.config, self.employees),
+            "slots": self.slots,
+            "cache_dir": CACHE_DIR,
+            "fixed_schedule": self.fixed_schedule,
+            "fixed_days": self.fixed_days
+        }
+        metrics = None
+        if self.config.get("metrics") or self.config.get("profile"):
+            metrics = Metrics(self.config.get("metrics"), self.config.get("metricsFormat", "jsonl"),
+                              self.config.get("profile"))
+            metrics.begin()
+        try:
+            return self._run(generation_args, Convergence.from_config(self.config), metrics)
+        finally:
+            if metrics is not None:
+                metrics.close()
+
+    def _run(self, generation_args: dict, convergence: Convergence, metrics):
+        number_of_epochs = self.config["numberOfEpochs"]
+        checkpoint_interval = self.config.get("checkpointInterval", 0)
+        islands = self.config.get("islands", 1)
+        if islands > 1:
+            if checkpoint_interval or self.resume:
+                logging.warning("checkpoints are not supported with islands")
+            if self.config.get("profile"):
+                logging.warning("only the main process is profiled with islands")
+            best_population, best_invalid_population, self.epochs = run_islands(
+                generation_args, number_of_epochs, islands, self.config.get("migrationInterval", 10), convergence,
+                metrics)
+            self.stop_reason = convergence.stop_reason
+            if not self.config.get("localSearchTime", 0):
+                return best_population, best_invalid_population
+            # The islands run on other processes, the local search only needs the blocks and the evaluation
+            generation = Generation.create_generation(**{**generation_args, "number_of_populations": 0})
+            return self._refine(generation, best_population, best_invalid_population, convergence)
+
+        generation = Generation.create_generation(**generation_args)
+        best_population, best_invalid_population = None, None
+        if self.resume:
+            best_population, best_invalid_population = generation.load_checkpoint(CHECKPOINT, convergence)
+        best_population, best_invalid_population = generation.run(
+            number_of_epochs, best_population, best_invalid_population, checkpoint=CHECKPOINT,
+            checkpoint_interval=checkpoint_interval, convergence=convergence, metrics=metrics)
+        self.epochs = generation.epoch
+        self.stop_reason = convergence.stop_reason
+        return self._refine(generation, best_population, best_invalid_population, convergence)
+
+    def _refine(self, generation: Generation, best_population, best_invalid_population, convergence: Convergence):
+        # Runs the local search for localSearchTime seconds (0 disables it) on the best schedule,
+        # the invalid one when there is no valid schedule yet
+        time_limit = self.config.get("localSearchTime", 0)
+        population = best_population or best_invalid_population
+        if not time_limit or population is None or \
+                (best_population is not None and best_population.score >= convergence.target_score):
+            return best_population, best_invalid_population
+        local_search = LocalSearch(generation, time_limit, convergence.target_score,
+                                   self.config.get("localSearchTemperature", TEMPERATURE))
+        refined = local_search.run(population)
+        if not refined.invalid and (best_population is None or refined.score > best_population.score):
+            return refined, best_invalid_population
+        if refined.invalid and (best_invalid_population is None or refined.score > best_invalid_population.score):
+            return best_population, refined
+        return best_population, best_invalid_population
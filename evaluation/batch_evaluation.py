@@ -0,0 +1,414 @@
+import hashlib
+import time
+
+import numpy as np
+
+from evaluation.duplicate_employee_evaluation import DuplicateEmployeeEvaluation
+from evaluation.employee_of_week_evaluation import EmployeeOfWeekEvaluation
+from evaluation.employees_quantity_evaluation import EmployeeQuantityEvaluation
+from evaluation.history_fairness_evaluation import HistoryFairnessEvaluation
+from evaluation.lru_cache import LruCache
+from evaluation.more_than_7_days_evaluation import MoreThan7DaysEvaluation
+from evaluation.on_call_possible_evaluation import OnCallPossibleEvaluation
+
+EVALUATIONS = [DuplicateEmployeeEvaluation, EmployeeOfWeekEvaluation, EmployeeQuantityEvaluation,
+               MoreThan7DaysEvaluation, OnCallPossibleEvaluation]
+
+# Upper bound of cells of the (population x day x employee) count tensor built per chunk
+MAX_CHUNK_CELLS = 4_000_000
+# A population created from a parent is evaluated from the aggregates of the parent
+# when it changes at most this fraction of the days and the schedule has at least
+# DELTA_MIN_CELLS (day x employee) cells, smaller schedules are faster in the batch
+DELTA_MAX_CHANGED_DAYS = 0.25
+DELTA_MIN_CELLS = 2_000
+# Default number of populations whose aggregates are cached by the hash of their schedule and
+# of weeks whose DuplicateEmployeeEvaluation and EmployeeOfWeekEvaluation results are cached.
+# The week kernels are cheap bincounts, so the week cache is disabled by default: looking up
+# the distinct weeks of a batch usually takes longer than scoring them again
+FITNESS_CACHE_SIZE = 4_096
+WEEK_CACHE_SIZE = 0
+# Name of the time spent looking up the week cache on BatchEvaluation.timings
+WEEK_CACHE = "WeekCache"
+
+
+class Aggregates:
+    # Partial results of the evaluations of one population, the scores are computed from them:
+    # duplicates: days without an employee on two slots, per week
+    # modes: sum of the days of the most frequent employee of each slot, per week (padding not counted)
+    # totals: slots taken by each employee id (the empty slot and the padding included)
+    # windows: MoreThan7DaysEvaluation rows with an employee on 8 days or more
+    # possible: days with an unavailable or a duplicated employee
+    # loads: weighted days of each employee, empty when there is no history
+    __slots__ = ("duplicates", "modes", "totals", "windows", "possible", "loads")
+
+    def __init__(self, duplicates, modes, totals, windows, possible, loads):
+        self.duplicates = duplicates
+        self.modes = modes
+        self.totals = totals
+        self.windows = windows
+        self.possible = possible
+        self.loads = loads
+
+
+class BatchEvaluation:
+    def __init__(self, codebook, on_call_not_possible: np.ndarray, fitness_cache_size=FITNESS_CACHE_SIZE,
+                 week_cache_size=WEEK_CACHE_SIZE, history=None):
+        # The schedules are encoded with the ids of the codebook. With a history (see history.py)
+        # HistoryFairnessEvaluation takes the place of EmployeeQuantityEvaluation
+        self.employees = codebook.employees
+        self.history = history
+        self.evaluations = list(EVALUATIONS)
+        if history is not None:
+            self.evaluations[2] = HistoryFairnessEvaluation
+        self.blank = codebook.blank
+        self.padding = codebook.padding
+        self.dtype = codebook.dtype
+        self.not_possible = on_call_not_possible.astype(np.int64)
+        self.fitness_cache = LruCache(fitness_cache_size)
+        self.week_cache = LruCache(week_cache_size)
+        # Seconds spent on each evaluation, by the name of the evaluation class
+        self.timings = {evaluation_class.__name__: 0.0 for evaluation_class in self.evaluations}
+        if week_cache_size > 0:
+            self.timings[WEEK_CACHE] = 0.0
+
+    def cache_stats(self):
+        # Hits and misses of the caches, to size them for the population settings
+        return {"fitness": self.fitness_cache.stats(), "week": self.week_cache.stats()}
+
+    def encode(self, populations: list):
+        # Returns a (population x day x slot) tensor with the employee ids
+        return np.stack([population.on_call_schedule for population in populations]).astype(np.int64)
+
+    def evaluate(self, populations: list):
+        # Scores every population in one batch, it gives exactly the same
+        # score and invalid flag as Population.evaluate.
+        # Populations already evaluated are skipped, the ones with a cached schedule (or the same schedule
+        # as another population of the batch) reuse its aggregates and the ones with few changes
+        # from a parent are evaluated from the aggregates of the parent
+        full = []
+        delta = []
+        cached = []
+        keys = {}
+        duplicates = []
+        for population in populations:
+            if population.score is not None and population.aggregates is not None:
+                continue
+            if self.fitness_cache.size > 0:
+                key = hashlib.blake2b(population.on_call_schedule.tobytes(), digest_size=16).digest()
+                if key in keys:
+                    duplicates.append((population, keys[key]))
+                    population.parents = None
+                    continue
+                aggregates = self.fitness_cache.get(key)
+                if aggregates is not None:
+                    cached.append((population, aggregates))
+                    population.parents = None
+                    continue
+                keys[key] = population
+            parent, changed_days = None, None
+            if len(population.on_call_schedule) * (self.padding + 1) >= DELTA_MIN_CELLS:
+                parent, changed_days = self._closest_parent(population)
+            if parent is not None and len(changed_days) <= DELTA_MAX_CHANGED_DAYS * len(population.on_call_schedule):
+                delta.append((population, parent, changed_days))
+            else:
+                full.append(population)
+            population.parents = None
+
+        if full:
+            schedules = self.encode(full)
+            _, days, _ = schedules.shape
+            chunk_size = max(1, MAX_CHUNK_CELLS // (days * (self.padding + 1)))
+            for chunk_start in range(0, len(full), chunk_size):
+                chunk = full[chunk_start:chunk_start + chunk_size]
+                aggregates = self.evaluate_schedules(schedules[chunk_start:chunk_start + chunk_size])
+                self._set_scores(chunk, aggregates, days, self._active_slots(schedules[0]))
+        if delta:
+            aggregates = [self._evaluate_delta(*d) for d in delta]
+            aggregates = Aggregates(*[np.stack([getattr(a, name) for a in aggregates]) for name in Aggregates.__slots__])
+            schedule = delta[0][0].on_call_schedule
+            self._set_scores([d[0] for d in delta], aggregates, schedule.shape[0], self._active_slots(schedule))
+        for key, population in keys.items():
+            self.fitness_cache.put(key, Aggregates(*[getattr(population.aggregates, name).copy()
+                                                     for name in Aggregates.__slots__]))
+        cached += [(population, source.aggregates) for population, source in duplicates]
+        if cached:
+            aggregates = Aggregates(*[np.stack([getattr(a, name) for _, a in cached])
+                                      for name in Aggregates.__slots__])
+            schedule = cached[0][0].on_call_schedule
+            self._set_scores([c[0] for c in cached], aggregates, schedule.shape[0], self._active_slots(schedule))
+
+    def evaluate_schedules(self, schedules: np.ndarray):
+        # Returns the aggregates of a (population x day x slot) tensor
+        day_counts = self._count_per_day(schedules)
+        kernels = [(self._employees_quantity, day_counts), (self._more_than_7_days, day_counts),
+                   (self._on_call_possible, day_counts)]
+        results = list(self._week_aggregates(schedules))
+        for evaluation_class, (kernel, values) in zip(self.evaluations[2:], kernels):
+            start = time.perf_counter()
+            results.append(kernel(values))
+            self.timings[evaluation_class.__name__] += time.perf_counter() - start
+        start = time.perf_counter()
+        results.append(self._history_loads(day_counts))
+        self.timings[self.evaluations[2].__name__] += time.perf_counter() - start
+        return Aggregates(*results)
+
+    def _week_aggregates(self, schedules: np.ndarray):
+        # Returns the (population x week) results of DuplicateEmployeeEvaluation and EmployeeOfWeekEvaluation,
+        # which only depend on the days of each week. Every distinct week of the batch is looked up
+        # on the week cache by its bytes and only the missing ones run the kernels
+        populations, days, slots = schedules.shape
+        kernels = [(DuplicateEmployeeEvaluation, self._duplicate_employee),
+                   (EmployeeOfWeekEvaluation, self._employee_of_week)]
+        if self.week_cache.size <= 0 or days % 7:
+            results = []
+            for evaluation_class, kernel in kernels:
+                start = time.perf_counter()
+                results.append(kernel(schedules))
+                self.timings[evaluation_class.__name__] += time.perf_counter() - start
+            return results
+
+        start = time.perf_counter()
+        weeks = np.ascontiguousarray(schedules.reshape(-1, 7 * slots).astype(self.dtype))
+        unique_weeks, inverse = np.unique(weeks.view(np.dtype((np.void, weeks.strides[0]))).ravel(),
+                                          return_inverse=True)
+        values = np.zeros((2, len(unique_weeks)), dtype=np.int64)
+        missing = []
+        for index, week in enumerate(unique_weeks):
+            key = week.tobytes()
+            value = self.week_cache.get(key)
+            if value is None:
+                missing.append(index)
+            else:
+                values[:, index] = value
+        self.timings[WEEK_CACHE] += time.perf_counter() - start
+
+        if missing:
+            missing_weeks = np.frombuffer(unique_weeks[missing].tobytes(), dtype=self.dtype)
+            missing_weeks = missing_weeks.reshape(len(missing), 7, slots).astype(np.int64)
+            for row, (evaluation_class, kernel) in enumerate(kernels):
+                start = time.perf_counter()
+                values[row, missing] = kernel(missing_weeks)[:, 0]
+                self.timings[evaluation_class.__name__] += time.perf_counter() - start
+            start = time.perf_counter()
+            for index in missing:
+                self.week_cache.put(unique_weeks[index].tobytes(), (int(values[0, index]), int(values[1, index])))
+            self.timings[WEEK_CACHE] += time.perf_counter() - start
+        return [row[inverse.ravel()].reshape(populations, days // 7) for row in values]
+
+    def _active_slots(self, schedule: np.ndarray):
+        # Slots of the schedule which are not padding, every population of a generation has the same ones
+        return int((schedule != self.padding).sum())
+
+    def score_aggregates(self, aggregates: Aggregates, days: int, active_slots: int):
+        # Returns the scores and invalid flags of each evaluation, in the same order as EVALUATIONS
+        results = [self._duplicate_employee_score(aggregates.duplicates, days),
+                   self._employee_of_week_score(aggregates.modes, active_slots),
+                   self._employees_quantity_score(aggregates.totals) if self.history is None
+                   else self._history_fairness_score(aggregates.loads),
+                   self._more_than_7_days_score(aggregates.windows, days),
+                   self._on_call_possible_score(aggregates.possible)]
+        return [r[0] for r in results], [r[1] for r in results]
+
+    def _set_scores(self, populations: list, aggregates: Aggregates, days: int, active_slots: int):
+        scores, invalids = self.score_aggregates(aggregates, days, active_slots)
+        for index, population in enumerate(populations):
+            population.aggregates = Aggregates(*[getattr(aggregates, name)[index] for name in Aggregates.__slots__])
+            population.evaluation = []
+            for evaluation_index, evaluation_class in enumerate(self.evaluations):
+                evaluation = evaluation_class(population, self.history) \
+                    if evaluation_class is HistoryFairnessEvaluation else evaluation_class(population)
+                evaluation.score = scores[evaluation_index][index]
+                evaluation.invalid = bool(invalids[evaluation_index][index])
+                population.evaluation.append(evaluation)
+            population.score = sum([e.score for e in population.evaluation])
+            population.invalid = any([e.invalid for e in population.evaluation])
+
+    @staticmethod
+    def _closest_parent(population):
+        # Returns the evaluated parent with fewer days different from the population and these days
+        closest = None, None
+        for parent in population.parents or []:
+            if parent.aggregates is None or parent.on_call_schedule.shape != population.on_call_schedule.shape:
+                continue
+            changed_days = np.flatnonzero((parent.on_call_schedule != population.on_call_schedule).any(axis=1))
+            if closest[0] is None or len(changed_days) < len(closest[1]):
+                closest = parent, changed_days
+        return closest
+
+    def _evaluate_delta(self, population, parent, changed_days: np.ndarray):
+        # Updates the aggregates of the parent only on the weeks, days and windows
+        # of MoreThan7DaysEvaluation which have a changed day
+        schedule = population.on_call_schedule.astype(np.int64)
+        parent_schedule = parent.on_call_schedule.astype(np.int64)
+        aggregates = parent.aggregates
+        days, slots = schedule.shape
+        ids = self.padding + 1
+
+        weeks = np.unique(changed_days // 7)
+        week_days = (weeks.reshape(-1, 1) * 7 + np.arange(7)).ravel()
+        week_days = week_days[week_days < days]
+        duplicates = aggregates.duplicates.copy()
+        modes = aggregates.modes.copy()
+        if self.week_cache.size > 0 and days % 7 == 0:
+            duplicates[weeks], modes[weeks] = [values[0] for values in self._week_aggregates(
+                schedule[week_days][np.newaxis])]
+        else:
+            start = time.perf_counter()
+            local_week = np.searchsorted(weeks, week_days // 7)
+            different = self._different_employees(schedule[week_days])
+            duplicates[weeks] = np.bincount(local_week, weights=different, minlength=len(weeks))
+            self.timings[DuplicateEmployeeEvaluation.__name__] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            group = (local_week.reshape(-1, 1) * slots + np.arange(slots)) * ids + schedule[week_days]
+            counts = np.bincount(group.ravel(), minlength=len(weeks) * slots * ids)
+            modes[weeks] = counts.reshape(len(weeks), slots, ids)[:, :, :self.padding].max(axis=2).sum(axis=1)
+            self.timings[EmployeeOfWeekEvaluation.__name__] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        totals = aggregates.totals + np.bincount(schedule[changed_days].ravel(), minlength=ids) - np.bincount(
+            parent_schedule[changed_days].ravel(), minlength=ids)
+        loads = aggregates.loads
+        if self.history is not None:
+            weights = np.repeat(self.history.weights[changed_days], slots)
+            loads = loads + (np.bincount(schedule[changed_days].ravel(), weights=weights, minlength=ids) - np.bincount(
+                parent_schedule[changed_days].ravel(), weights=weights, minlength=ids))[:self.blank]
+        self.timings[self.evaluations[2].__name__] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows = np.unique((changed_days.reshape(-1, 1) + np.arange(9)).ravel())
+        window_days = rows.reshape(-1, 1) - np.arange(9)
+        window_ids = np.where(((window_days >= 0) & (window_days < days))[:, :, np.newaxis],
+                              schedule[np.clip(window_days, 0, days - 1)], self.blank)
+        index = np.arange(len(rows)).reshape(-1, 1, 1) * ids + window_ids
+        counts = np.bincount(index.ravel(), minlength=len(rows) * ids).reshape(len(rows), ids)
+        windows = aggregates.windows.copy()
+        windows[rows] = (counts[:, :self.blank] >= 8).any(axis=1)
+        self.timings[MoreThan7DaysEvaluation.__name__] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = np.arange(len(changed_days)).reshape(-1, 1) * ids + schedule[changed_days]
+        counts = np.bincount(index.ravel(), minlength=len(changed_days) * ids).reshape(len(changed_days), ids)
+        counts = counts[:, :self.blank]
+        not_possible = changed_days[changed_days < self.not_possible.shape[0]]
+        counts[:len(not_possible)] += self.not_possible[not_possible]
+        possible = aggregates.possible.copy()
+        possible[changed_days] = (counts >= 2).any(axis=1)
+        self.timings[OnCallPossibleEvaluation.__name__] += time.perf_counter() - start
+        return Aggregates(duplicates, modes, totals, windows, possible, loads)
+
+    def _count_per_day(self, schedules: np.ndarray):
+        # How many slots each employee (and the empty slot and the padding) takes on each day
+        populations, days, _ = schedules.shape
+        ids = self.padding + 1
+        index = (np.arange(populations * days).reshape(populations, days, 1) * ids + schedules).ravel()
+        return np.bincount(index, minlength=populations * days * ids).reshape(populations, days, ids)
+
+    def _different_employees(self, schedules: np.ndarray):
+        # True on the days without an employee on two slots, the empty slots and the padding
+        # are not employees. The slots are sorted, so two equal employees are neighbours
+        ordered = np.sort(schedules, axis=-1)
+        same = (ordered[..., 1:] == ordered[..., :-1]) & (ordered[..., 1:] < self.blank)
+        return ~same.any(axis=-1)
+
+    def _duplicate_employee(self, schedules: np.ndarray):
+        # Days without an employee on two slots, per week. A day with one employee doing on-call is always different
+        populations, days, _ = schedules.shape
+        weeks = -(-days // 7)
+        different = np.zeros((populations, weeks * 7), dtype=np.int64)
+        different[:, :days] = self._different_employees(schedules)
+        return different.reshape(populations, weeks, 7).sum(axis=2)
+
+    @staticmethod
+    def _duplicate_employee_score(duplicates: np.ndarray, days: int):
+        # Same as DuplicateEmployeeEvaluation
+        max_score = 17
+        score = duplicates.sum(axis=-1) * (max_score / days)
+        return score, score != max_score
+
+    def _employee_of_week(self, schedules: np.ndarray):
+        # Sum of how many times the most frequent employee of each week appears on each slot,
+        # the padding is not an employee
+        populations, days, slots = schedules.shape
+        ids = self.padding + 1
+        weeks = -(-days // 7)
+        week_of_day = np.arange(days) // 7
+        group = (np.arange(populations).reshape(-1, 1, 1) * weeks + week_of_day.reshape(1, -1, 1)) * slots
+        group = group + np.arange(slots).reshape(1, 1, -1)
+        counts = np.bincount((group * ids + schedules).ravel(), minlength=populations * weeks * slots * ids)
+        return counts.reshape(populations, weeks, slots, ids)[:, :, :, :self.padding].max(axis=3).sum(axis=2)
+
+    @staticmethod
+    def _employee_of_week_score(modes: np.ndarray, active_slots: int):
+        # Same as EmployeeOfWeekEvaluation
+        max_score = 17
+        score = modes.sum(axis=-1) * (max_score / active_slots)
+        return score, np.zeros(score.shape, dtype=bool)
+
+    def _employees_quantity(self, day_counts: np.ndarray):
+        # Slots taken by each employee, by the empty slot and by the padding
+        return day_counts.sum(axis=1)
+
+    def _employees_quantity_score(self, totals: np.ndarray):
+        # Same as EmployeeQuantityEvaluation, the empty slot is counted
+        # as a value like the pandas implementation does and the padding is not
+        max_score = 16
+        totals = totals[..., :self.padding]
+        present = totals > 0
+        highest = totals.max(axis=-1)
+        lowest = np.where(present, totals, np.iinfo(totals.dtype).max).min(axis=-1)
+        score = np.where(present.sum(axis=-1) == len(self.employees),
+                         max_score - np.maximum(0, highest - lowest - 5), 0)
+        return score, np.zeros(score.shape, dtype=bool)
+
+    def _history_loads(self, day_counts: np.ndarray):
+        # Weighted days of each employee, the weights of the days come from the history
+        if self.history is None:
+            return np.zeros((day_counts.shape[0], 0))
+        return np.einsum("pde,d->pe", day_counts[:, :, :self.blank], self.history.weights[:day_counts.shape[1]])
+
+    def _history_fairness_score(self, loads: np.ndarray):
+        # Same as HistoryFairnessEvaluation
+        max_score = 16
+        cumulative = self.history.loads + loads
+        spread = cumulative.max(axis=-1) - cumulative.min(axis=-1)
+        score = max_score * self.history.tolerance / np.maximum(self.history.tolerance, spread)
+        return score, np.zeros(score.shape, dtype=bool)
+
+    def _more_than_7_days(self, day_counts: np.ndarray):
+        # Like MoreThan7DaysEvaluation, every row is a window of 9 days (the day
+        # and the 8 days before it) and the 8 rows after the last day hold the tail
+        # of the schedule. A row is True when an employee appears 8 times or more
+        populations, days, _ = day_counts.shape
+        cumulative = np.zeros((populations, days + 1, self.blank), dtype=np.int64)
+        np.cumsum(day_counts[:, :, :self.blank], axis=1, out=cumulative[:, 1:])
+        rows = np.arange(days + 8)
+        windows = cumulative[:, np.minimum(rows, days - 1) + 1] - cumulative[:, np.maximum(rows - 8, 0)]
+        return (windows >= 8).any(axis=2)
+
+    @staticmethod
+    def _more_than_7_days_score(windows: np.ndarray, days: int):
+        # Same as MoreThan7DaysEvaluation
+        max_score = 25
+        count = windows.sum(axis=-1)
+        score = max_score * (1 - (count / (days + 8)))
+        return score, count > 0
+
+    def _on_call_possible(self, day_counts: np.ndarray):
+        # Like OnCallPossibleEvaluation, a day is True when an employee is unavailable
+        # and scheduled or appears twice on the same day.
+        # Schedule and unavailability are aligned by day like pandas.concat does
+        days = max(day_counts.shape[1], self.not_possible.shape[0])
+        counts = np.zeros((day_counts.shape[0], days, self.blank), dtype=np.int64)
+        counts[:, :day_counts.shape[1]] += day_counts[:, :, :self.blank]
+        counts[:, :self.not_possible.shape[0]] += self.not_possible
+        return (counts >= 2).any(axis=2)
+
+    @staticmethod
+    def _on_call_possible_score(possible: np.ndarray):
+        # Same as OnCallPossibleEvaluation
+        max_score = 25
+        days = possible.shape[-1]
+        count = possible.sum(axis=-1)
+        score = (days - count) * (max_score / days)
+        return score, count > 0
@@ -13,18 +13,25 @@ class DuplicateEmployeeEvaluation(Evaluation):
         # Returns a low score if the same employee appears twice on the same day
         # it means, if the support is done in pairs, the same person cannot do
         # on-call support twice on the same day.
-        # It raises an invalid flag
+        # It raises an invalid flag. The empty slots and the padding of the days
+        # with fewer employees doing on-call are not employees
         score = 0
-        for week_start in range(0, len(self.population.on_call_schedule), 7):
-            week = self.population.on_call_schedule[week_start:week_start + 7]
-            score += week[week[0] != week[1]].shape[0]
+        on_call_schedule = self.population.to_data_frame()
+        for week_start in range(0, len(on_call_schedule), 7):
+            week = on_call_schedule[week_start:week_start + 7]
+            score += int(week.apply(self._different_employees, axis=1).sum())
 
-        score *= self.max_score / len(self.population.on_call_schedule)
+        score *= self.max_score / len(on_call_schedule)
         self.score = score
 
         if score != self.max_score:
             self.invalid = True
         return self.score
 
+    @staticmethod
+    def _different_employees(day):
+        employees = [employee for employee in day.dropna() if employee]
+        return len(employees) == len(set(employees))
+
     def get_score_to_str(self):
         return f"duplicate_employee_score: {self.score:.2f}"
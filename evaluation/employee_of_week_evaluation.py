@@ -13,14 +13,17 @@ class EmployeeOfWeekEvaluation(Evaluation):
         # Returns a low score if there are multiple employees doing support in
         # just one week. It tries to add the same employee in the whole week
         score = 0
-        for week_start in range(0, len(self.population.on_call_schedule), 7):
-            week = self.population.on_call_schedule[week_start:week_start + 7]
+        on_call_schedule = self.population.to_data_frame()
+        for week_start in range(0, len(on_call_schedule), 7):
+            week = on_call_schedule[week_start:week_start + 7]
             for support_order in range(week.shape[1]):
+                # The padding of the days with fewer employees doing on-call is not counted
                 support = week[support_order].value_counts().sort_values(ascending=False)
-                score += support.values[0]
-        score *= self.max_score / (len(self.population.on_call_schedule) * self.population.on_call_schedule.shape[1])
+                if len(support):
+                    score += support.values[0]
+        score *= self.max_score / on_call_schedule.notna().sum().sum()
         self.score = score
         return self.score
 
     def get_score_to_str(self):
-        return f"score_more_than_7_days: {self.score:.2f}"
+        return f"employee_of_week_score: {self.score:.2f}"
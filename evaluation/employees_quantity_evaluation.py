@@ -1,5 +1,3 @@
-import pandas as pd
-
 from evaluation.evaluation import Evaluation
 
 
@@ -13,7 +11,9 @@ class EmployeeQuantityEvaluation(Evaluation):
 
     def evaluate(self):
         # Checks how many days each employee does support
-        df = pd.DataFrame(self.population.on_call_schedule.values)
+        import pandas as pd
+
+        df = self.population.to_data_frame()
         count_df = df.apply(pd.Series.value_counts, axis=0).sum(axis=1).sort_values(ascending=False)
         if count_df.shape[0] == len(self.population.employees):
             self.score = self.max_score - max(0, count_df[0:1].values[0] - count_df[-1:].values[0] - 5)
@@ -22,4 +22,4 @@ class EmployeeQuantityEvaluation(Evaluation):
         return self.score
 
     def get_score_to_str(self):
-        return f"employee_of_week_score: {self.score:.2f}"
+        return f"employees_quantity_score: {self.score:.2f}"
@@ -0,0 +1,29 @@
+import numpy as np
+
+from evaluation.evaluation import Evaluation
+
+
+class HistoryFairnessEvaluation(Evaluation):
+    # Takes the place of EmployeeQuantityEvaluation when the template has a history (see history.py)
+    def __init__(self, population, history=None):
+        super().__init__()
+        self.max_score = 16
+        self.population = population
+        self.history = history
+        self.score = 0
+        self.invalid = False
+
+    def evaluate(self):
+        # Checks the difference between the employee with the highest and the lowest cumulative
+        # load, the weighted days of the history plus the weighted days of the schedule.
+        # The score starts to drop when the difference is higher than the tolerance of the history
+        schedule = self.population.on_call_schedule
+        blank = self.population.codebook.blank
+        weights = np.repeat(self.history.weights[:schedule.shape[0]], schedule.shape[1])
+        loads = self.history.loads + np.bincount(schedule.ravel(), weights=weights, minlength=blank + 1)[:blank]
+        spread = loads.max() - loads.min()
+        self.score = self.max_score * self.history.tolerance / max(self.history.tolerance, spread)
+        return self.score
+
+    def get_score_to_str(self):
+        return f"history_fairness_score: {self.score:.2f}"
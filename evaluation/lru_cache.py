@@ -0,0 +1,38 @@
+from collections import OrderedDict
+
+
+class LruCache:
+    # Bounded cache which drops the least recently used entry when it is full
+    # and counts its hits and misses. A size of 0 disables it
+    def __init__(self, size: int):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.size <= 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": self.size, "entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0}
+
+    def __getstate__(self):
+        # The islands send their generation to the worker processes on every migration,
+        # the entries are not sent and the cache of each island is filled again
+        return {"size": self.size, "entries": OrderedDict(), "hits": self.hits, "misses": self.misses}
@@ -1,5 +1,4 @@
 import numpy as np
-import pandas as pd
 
 from evaluation.evaluation import Evaluation
 
@@ -15,7 +14,9 @@ class MoreThan7DaysEvaluation(Evaluation):
     def evaluate(self):
         # Low score if employee do on-call support for more than 7 days.
         # It raises an invalid flag
-        values = self.population.on_call_schedule.values
+        import pandas as pd
+
+        values = self.population.to_data_frame().values
         df = pd.DataFrame(values)
         for i in range(8):
             zeros = [['0'] * values.shape[1]]
@@ -33,4 +34,4 @@ class MoreThan7DaysEvaluation(Evaluation):
         return self.score
 
     def get_score_to_str(self):
-        return f"on_call_possible_score: {self.score:.2f}"
+        return f"more_than_7_days_score: {self.score:.2f}"
@@ -1,4 +1,4 @@
-import pandas as pd
+import numpy as np
 
 from evaluation.evaluation import Evaluation
 
@@ -15,8 +15,12 @@ class OnCallPossibleEvaluation(Evaluation):
         # Checks if the employees are available to do on-call on
         # the days which was attributed to her/him.
         # It raises an invalid flag
-        df = pd.DataFrame(self.population.on_call_schedule.values)
-        df = pd.concat([df, pd.DataFrame(self.population.on_call_not_possible)], axis=1)
+        import pandas as pd
+
+        df = self.population.to_data_frame()
+        not_possible = np.where(self.population.on_call_not_possible,
+                                np.array(self.population.employees, dtype=object), "")
+        df = pd.concat([df, pd.DataFrame(not_possible, columns=self.population.employees)], axis=1)
         count_df = df.apply(pd.Series.value_counts, axis=1).drop(columns=[""])
         count_df = count_df[(count_df >= 2)].dropna(axis=0, how="all")
 
@@ -27,4 +31,4 @@ class OnCallPossibleEvaluation(Evaluation):
         return self.score
 
     def get_score_to_str(self):
-        return f"employees_quantity_score: {self.score:.2f}"
+        return f"on_call_possible_score: {self.score:.2f}"
@@ -0,0 +1,114 @@
+import csv
+import json
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from codebook import Codebook
+
+
+def _days(start_date: date, schedule: np.ndarray, codebook: Codebook):
+    # Yields the date and the employee names of each day of the schedule
+    for index, row in enumerate(schedule):
+        yield start_date + timedelta(days=index), codebook.names[row].tolist()
+
+
+class Exporter:
+    # Writes an encoded schedule on path row by row, any number of slots is supported
+    # and no intermediate DataFrame is built, so the memory does not grow with the horizon.
+    # roles names the slots (e.g. ["primary", "secondary"]), the padding of the days with
+    # fewer employees doing on-call is written as an empty slot
+    extension = None
+
+    def __init__(self, path: str, roles=None):
+        self.path = path
+        self.roles = roles or []
+
+    def slot_label(self, slot: int):
+        # On-Call <slot> or On-Call <slot> (<role>)
+        if slot < len(self.roles) and self.roles[slot]:
+            return f"On-Call {slot + 1} ({self.roles[slot]})"
+        return f"On-Call {slot + 1}"
+
+    def export(self, schedule: np.ndarray, codebook: Codebook, start_date: date, possibilities=None):
+        pass
+
+
+class CsvExporter(Exporter):
+    # The result file read by pdf_writer.py and the re-planning:
+    # Date,Day Of Week,On-Call 1,...,On-Call <slots>
+    extension = ".csv"
+
+    def export(self, schedule: np.ndarray, codebook: Codebook, start_date: date, possibilities=None):
+        with open(self.path, "w", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(["Date", "Day Of Week"] + [self.slot_label(slot) for slot in range(schedule.shape[1])])
+            for day, names in _days(start_date, schedule, codebook):
+                writer.writerow([day.strftime("%d/%m/%Y"), day.strftime("%A")] + names)
+
+
+class JsonExporter(Exporter):
+    # {"startDate": ..., "slots": ..., "roles": [...], "days": [{"date": ..., "dayOfWeek": ..., "onCall": [...]}, ...]},
+    # the empty slots are null
+    extension = ".json"
+
+    def export(self, schedule: np.ndarray, codebook: Codebook, start_date: date, possibilities=None):
+        with open(self.path, "w") as f:
+            f.write(f'{{"startDate": {json.dumps(start_date.strftime("%d/%m/%Y"))}, '
+                    f'"slots": {schedule.shape[1]}, "roles": {json.dumps(self.roles)}, "days": [')
+            for index, (day, names) in enumerate(_days(start_date, schedule, codebook)):
+                f.write(("," if index else "") + "\n  " + json.dumps({
+                    "date": day.strftime("%d/%m/%Y"),
+                    "dayOfWeek": day.strftime("%A"),
+                    "onCall": [name or None for name in names]
+                }))
+            f.write("\n]}\n")
+
+
+class IcsExporter(Exporter):
+    # iCalendar file with one all-day event per employee and on-call block. The blocks are the
+    # possibilities (see Population.create_possibilities), split where the employee of a slot changes,
+    # without possibilities a block ends at the end of the week or when the employee changes
+    extension = ".ics"
+
+    def export(self, schedule: np.ndarray, codebook: Codebook, start_date: date, possibilities=None):
+        if possibilities is None:
+            possibilities = [{"days": 7}] * -(-schedule.shape[0] // 7)
+        boundaries = set(np.cumsum([0] + [p["days"] for p in possibilities]).tolist())
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+        with open(self.path, "w", newline="") as f:
+            f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//on-call-support-planning//EN\r\n")
+            # First day and employee of the open event of each slot
+            events = [None] * schedule.shape[1]
+            for index, (day, names) in enumerate(_days(start_date, schedule, codebook)):
+                for slot, name in enumerate(names):
+                    if events[slot] is not None and (index in boundaries or events[slot][1] != name):
+                        self._write_event(f, events[slot], day, slot, self.slot_label(slot), stamp)
+                        events[slot] = None
+                    if events[slot] is None and name:
+                        events[slot] = (day, name)
+            end = start_date + timedelta(days=schedule.shape[0])
+            for slot, event in enumerate(events):
+                if event is not None:
+                    self._write_event(f, event, end, slot, self.slot_label(slot), stamp)
+            f.write("END:VCALENDAR\r\n")
+
+    @staticmethod
+    def _write_event(f, event: tuple, end: date, slot: int, label: str, stamp: str):
+        start, name = event
+        summary = f"{label}: {name}".replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;")
+        f.write("BEGIN:VEVENT\r\n"
+                f"UID:{start.strftime('%Y%m%d')}-{slot + 1}-{name.replace(' ', '_')}@on-call-support-planning\r\n"
+                f"DTSTAMP:{stamp}\r\n"
+                f"DTSTART;VALUE=DATE:{start.strftime('%Y%m%d')}\r\n"
+                f"DTEND;VALUE=DATE:{end.strftime('%Y%m%d')}\r\n"
+                f"SUMMARY:{summary}\r\n"
+                "END:VEVENT\r\n")
+
+
+EXPORTERS = {
+    "csv": CsvExporter,
+    "json": JsonExporter,
+    "ics": IcsExporter
+}
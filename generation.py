@@ -1,69 +1,237 @@
+import logging
+import os
 import random
+import time
 
+import numpy as np
+
+from codebook import Codebook
+from convergence import EPOCHS, Convergence
+from evaluation.batch_evaluation import FITNESS_CACHE_SIZE, WEEK_CACHE_SIZE, BatchEvaluation
 from population import Population
 
 
+SELECTIONS = ["tournament", "rank"]
+# Phases of an epoch measured on Generation.timings, besides the evaluations
+TIMINGS = ["construction", "crossover", "mutation", "selection"]
+
+
 class Generation:
     def __init__(self, populations: list, number_of_populations: int, number_of_employees_doing_on_call: int,
-                 employees: list, week_quantity: int, on_call_not_possible: dict, possibilities: list, epoch=0):
+                 codebook: Codebook, week_quantity: int, on_call_not_possible: np.ndarray, possibilities: list, epoch=0,
+                 selection="tournament", tournament_size=3, elitism=2, mutation_rate=0.2, fixed_days=None,
+                 fitness_cache_size=FITNESS_CACHE_SIZE, week_cache_size=WEEK_CACHE_SIZE, history=None):
+        if selection not in SELECTIONS:
+            raise ValueError(f"selection must be one of {SELECTIONS}, not {selection}")
         self.populations = populations
         self.on_call_not_possible = on_call_not_possible
         self.epoch = epoch
         self.number_of_populations = number_of_populations
         self.number_of_employees_doing_on_call = number_of_employees_doing_on_call
-        self.employees = employees
+        self.codebook = codebook
+        self.employees = codebook.employees
         self.week_quantity = week_quantity
         self.possibilities = possibilities
+        # The populations are created with the same schedule on fixed_days, the crossover keeps
+        # them and the mutation only changes the blocks of the other days
+        self.fixed_days = fixed_days
+        self.blocks = [block for block in Population.create_blocks(codebook, possibilities)
+                       if fixed_days is None or not fixed_days[block[0]]]
+        self.selection = selection
+        self.tournament_size = tournament_size
+        self.elitism = min(elitism, number_of_populations)
+        self.mutation_rate = mutation_rate
         self.best_population = None
+        self.keys = None
+        self.batch_evaluation = BatchEvaluation(codebook, on_call_not_possible, fitness_cache_size, week_cache_size,
+                                                history)
+        # Seconds spent on each phase since the last call of reset_timings
+        self.timings = dict.fromkeys(TIMINGS, 0.0)
+        self.recorded_evaluation_timings = dict(self.batch_evaluation.timings)
+
+    def run(self, number_of_epochs: int, best_population=None, best_invalid_population=None, label="",
+            checkpoint=None, checkpoint_interval=0, convergence=None, metrics=None, final=True):
+        # Runs epochs until number_of_epochs is reached or convergence stops the run, by default
+        # when a valid schedule scores 100. The state is saved on checkpoint every checkpoint_interval epochs
+        # and the measurements of each epoch are written by metrics.
+        # A round of an island (final=False) is not the end of the run, so convergence is not stopped.
+        # Returns the best valid and the best invalid populations found, the reason to stop is on convergence
+        convergence = convergence or Convergence()
+        convergence.begin()
+        base_mutation_rate = self.mutation_rate
+        # A resumed run goes on with the mutation rate of the epochs without improvement it had
+        self.mutation_rate = convergence.mutation_rate(base_mutation_rate)
+        while True:
+            if self.epoch >= number_of_epochs:
+                if final:
+                    convergence.stop(EPOCHS, self.epoch)
+                break
+            new_best_population = self.get_best_population()
+            if metrics is not None:
+                metrics.record(self)
+            self.reset_timings()
+            if best_population is None or best_population.score < new_best_population.score:
+                if not new_best_population.invalid:
+                    best_population = new_best_population
+                else:
+                    best_invalid_population = new_best_population
+
+            invalid_str = " (invalid schedule)" if new_best_population.invalid else " (valid schedule)"
+            logging.info(f"{label}epoch: {self.epoch} - score: {new_best_population.score:.2f} {invalid_str}")
+            logging.debug(new_best_population.get_score_to_str())
+            reason = convergence.update(self.epoch, new_best_population, best_population)
+            if reason:
+                if final:
+                    convergence.stop(reason, self.epoch)
+                break
+
+            self.mutation_rate = convergence.mutation_rate(base_mutation_rate)
+            self.next_generation()
+            if checkpoint and checkpoint_interval > 0 and self.epoch % checkpoint_interval == 0:
+                self.save_checkpoint(checkpoint, best_population, best_invalid_population, convergence)
+        self.mutation_rate = base_mutation_rate
+        logging.debug(f"{label}evaluation caches: {self.batch_evaluation.cache_stats()}")
+        return best_population, best_invalid_population
+
+    def save_checkpoint(self, path: str, best_population=None, best_invalid_population=None, convergence=None):
+        # Saves the epoch, the populations, the best populations, the state of the random
+        # generator and the progress of convergence in a compressed npz file, it can be loaded with load_checkpoint
+        version, internal_state, gauss_next = random.getstate()
+        arrays = {
+            "epoch": np.array(self.epoch),
+            "employees": np.array(self.employees),
+            "populations": np.stack([population.on_call_schedule for population in self.populations]),
+            "random_version": np.array(version),
+            "random_state": np.array(internal_state, dtype=np.uint32),
+            "random_gauss_next": np.array(np.nan if gauss_next is None else gauss_next)
+        }
+        if best_population is not None:
+            arrays["best_population"] = best_population.on_call_schedule
+        if best_invalid_population is not None:
+            arrays["best_invalid_population"] = best_invalid_population.on_call_schedule
+        if convergence is not None:
+            arrays.update({f"convergence_{name}": value for name, value in convergence.state().items()})
+
+        # The file is replaced only when the new one is complete
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(f"{path}.tmp", path)
+        logging.debug(f"checkpoint of epoch {self.epoch} saved on {path}")
+
+    def load_checkpoint(self, path: str, convergence=None):
+        # Restores the state saved by save_checkpoint, including the random generator and
+        # the progress of convergence. Returns the best valid and the best invalid populations saved
+        with np.load(path) as checkpoint:
+            populations = checkpoint["populations"]
+            if checkpoint["employees"].tolist() != self.employees or \
+                    populations.shape[2] != self.number_of_employees_doing_on_call:
+                raise ValueError(f"checkpoint {path} was not created with the same template")
+
+            self.epoch = int(checkpoint["epoch"])
+            self.populations = [Population(schedule, self.on_call_not_possible, codebook=self.codebook)
+                                for schedule in populations]
+            gauss_next = float(checkpoint["random_gauss_next"])
+            random.setstate((int(checkpoint["random_version"]), tuple(int(v) for v in checkpoint["random_state"]),
+                             None if np.isnan(gauss_next) else gauss_next))
+            best_populations = [Population(checkpoint[name], self.on_call_not_possible, codebook=self.codebook)
+                                if name in checkpoint else None
+                                for name in ["best_population", "best_invalid_population"]]
+            if convergence is not None and "convergence_best" in checkpoint:
+                convergence.restore({name[len("convergence_"):]: checkpoint[name] for name in checkpoint.files
+                                     if name.startswith("convergence_")})
+        self.batch_evaluation.evaluate([population for population in best_populations if population is not None])
+        logging.info(f"checkpoint of epoch {self.epoch} loaded from {path}")
+        return best_populations
+
+    def reset_timings(self):
+        self.timings = dict.fromkeys(TIMINGS, 0.0)
+        self.recorded_evaluation_timings = dict(self.batch_evaluation.timings)
 
     def get_best_population(self):
-        for population in self.populations:
-            population.evaluate()
-        self._sort_populations()
-        self.populations = sorted(self.populations, key=lambda p: (0 if p.invalid else 1, p.score))
-        self.populations.reverse()
-        return self.populations[0]
+        # Evaluates the populations and moves the elites, sorted from the best to the worst, to the
+        # beginning. Only the rank selection needs every population sorted, the other ones are kept
+        # in their order and self.keys holds the key of each population (valid ones first, then score)
+        self.batch_evaluation.evaluate(self.populations)
+        start = time.perf_counter()
+        scores = np.array([population.score for population in self.populations], dtype=float)
+        valid = np.array([not population.invalid for population in self.populations])
+        keys = scores + valid * (2 * np.abs(scores).max() + 1)
 
-    def _sort_populations(self):
-        self.populations = sorted(self.populations, key=lambda p: (0 if p.invalid else 1, p.score))
-        self.populations.reverse()
+        k = len(keys) if self.selection == "rank" else max(self.elitism, 1)
+        top = np.argpartition(-keys, k - 1)[:k] if k < len(keys) else np.arange(len(keys))
+        top = top[np.argsort(-keys[top], kind="stable")]
+        rest = np.setdiff1d(np.arange(len(keys)), top, assume_unique=True)
+        order = np.concatenate([top, rest])
+        self.populations = [self.populations[index] for index in order]
+        self.keys = keys[order]
+        self.timings["selection"] += time.perf_counter() - start
+        return self.populations[0]
 
     def next_generation(self):
-        populations = []
+        # The populations must be evaluated by get_best_population, the best ones
+        # are kept (elitism) and the others are replaced by their offspring
         self.epoch += 1
-        if self.best_population is None or self.best_population.score < self.populations[0].score:
-            self.best_population = self.populations[0]
-        else:
-            self.populations = [self.best_population] + self.populations
-        max_index = len(self.populations) if len(self.populations) % 2 == 0 else len(self.populations) - 1
-        for index in range(0, max_index, 2):
-            population_0 = self.populations[index].on_call_schedule.values
-            population_1 = self.populations[index + 1].on_call_schedule.values
-            new_population = []
-
-            for week in range(self.week_quantity):
-                alpha = 7 if self.epoch < 30 else random.randrange(1, 7)
-                for day in range(week * 7, (week * 7) + alpha):
-                    schedule = population_0[day] if week % 2 == 0 else population_1[day]
-                    new_population.append(schedule)
-                for day in range((week * 7) + alpha, (week + 1) * 7):
-                    schedule = population_0[day] if week % 2 != 0 else population_1[day]
-                    new_population.append(schedule)
-
-            populations.append(Population(new_population, self.on_call_not_possible, employees=self.employees))
-
-        populations = [
-            Population.create_population(self.employees, self.number_of_employees_doing_on_call,
-                                         self.on_call_not_possible,
-                                         self.possibilities) for i in range(int(self.number_of_populations / 2))]
+        self.best_population = self.populations[0]
+        populations = self.populations[:self.elitism]
+        while len(populations) < self.number_of_populations:
+            start = time.perf_counter()
+            parents = self._select(), self._select()
+            crossover_start = time.perf_counter()
+            population = self._crossover(*parents)
+            mutation_start = time.perf_counter()
+            if random.random() < self.mutation_rate:
+                population.mutate(self.blocks)
+            end = time.perf_counter()
+            self.timings["selection"] += crossover_start - start
+            self.timings["crossover"] += mutation_start - crossover_start
+            self.timings["mutation"] += end - mutation_start
+            populations.append(population)
         self.populations = populations
+        self.keys = None
+
+    def _select(self):
+        if self.selection == "tournament":
+            size = min(self.tournament_size, len(self.populations))
+            return self.populations[max(random.sample(range(len(self.populations)), size),
+                                        key=lambda index: self.keys[index])]
+        # Populations are sorted from the best to the worst for the rank selection
+        weights = range(len(self.populations), 0, -1)
+        return random.choices(self.populations, weights=weights)[0]
+
+    def _crossover(self, population_0: Population, population_1: Population):
+        # The first alpha days of the even weeks come from population_0 and the
+        # remaining days from population_1, it is the opposite on the odd weeks
+        days = population_0.on_call_schedule.shape[0]
+        weeks = -(-days // 7)
+        alpha = np.array([7 if self.epoch < 30 else random.randrange(1, 7) for week in range(weeks)])
+        day_of_week = np.arange(days) % 7
+        even_week = (np.arange(days) // 7) % 2 == 0
+        from_population_0 = (day_of_week < np.repeat(alpha, 7)[:days]) == even_week
+        schedule = np.where(from_population_0[:, np.newaxis], population_0.on_call_schedule,
+                            population_1.on_call_schedule)
+        population = Population(schedule, self.on_call_not_possible, codebook=self.codebook)
+        population.parents = (population_0, population_1)
+        return population
 
     @staticmethod
     def create_generation(number_of_populations: int, number_of_employees_doing_on_call: int, employees: list,
-                          week_quantity: int, on_call_not_possible: dict):
+                          week_quantity: int, on_call_not_possible: np.ndarray, selection="tournament", tournament_size=3,
+                          elitism=2, mutation_rate=0.2, cache_dir=None, fixed_schedule=None, fixed_days=None,
+                          fitness_cache_size=FITNESS_CACHE_SIZE, week_cache_size=WEEK_CACHE_SIZE, history=None,
+                          slots=None):
+        # number_of_employees_doing_on_call is the number of slots of the schedules, the highest
+        # value of slots when the days have a different number of employees doing on-call
+        start = time.perf_counter()
+        codebook = Codebook(employees)
         possibilities = Population.create_possibilities(number_of_employees_doing_on_call, employees, week_quantity,
-                                                        on_call_not_possible)
-        populations = [Population.create_population(employees, number_of_employees_doing_on_call, on_call_not_possible,
-                                                    possibilities) for i in range(number_of_populations)]
-        return Generation(populations, number_of_populations, number_of_employees_doing_on_call, employees,
-                          week_quantity, on_call_not_possible, possibilities)
+                                                        on_call_not_possible, cache_dir=cache_dir, slots=slots)
+        populations = [Population.create_population(codebook, number_of_employees_doing_on_call, on_call_not_possible,
+                                                    possibilities, fixed_schedule, fixed_days)
+                       for i in range(number_of_populations)]
+        generation = Generation(populations, number_of_populations, number_of_employees_doing_on_call, codebook,
+                                week_quantity, on_call_not_possible, possibilities, selection=selection,
+                                tournament_size=tournament_size, elitism=elitism, mutation_rate=mutation_rate,
+                                fixed_days=fixed_days, fitness_cache_size=fitness_cache_size,
+                                week_cache_size=week_cache_size, history=history)
+        generation.timings["construction"] = time.perf_counter() - start
+        return generation
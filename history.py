@@ -0,0 +1,103 @@
+import logging
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+# Default weight of a day of on-call on the weekend and on a holiday, a normal day is worth 1
+WEEKEND_WEIGHT = 1.5
+HOLIDAY_WEIGHT = 2.0
+# Default difference of cumulative load between the employees accepted by HistoryFairnessEvaluation
+HISTORY_TOLERANCE = 5.0
+
+
+def day_weights(start_date: date, days: int, weekend_weight=WEEKEND_WEIGHT, holiday_weight=HOLIDAY_WEIGHT,
+                holidays=()):
+    # Returns the weight of each day from start_date, the highest one when a holiday is on the weekend
+    holidays = {datetime.strptime(holiday, "%d/%m/%Y").date() for holiday in holidays}
+    weights = np.ones(days)
+    for index in range(days):
+        day = start_date + timedelta(days=index)
+        if day.weekday() >= 5:
+            weights[index] = max(weights[index], weekend_weight)
+        if day in holidays:
+            weights[index] = max(weights[index], holiday_weight)
+    return weights
+
+
+class HistoryStore:
+    # On-call history of a team on a SQLite file, one row per day and slot with the weight
+    # the day had when it was recorded. The rows are indexed by date and by employee and date,
+    # so loading the load of every employee is one grouped query
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS on_call (date TEXT NOT NULL, slot INTEGER NOT NULL, "
+                               "employee TEXT NOT NULL, weight REAL NOT NULL, PRIMARY KEY (date, slot))")
+            connection.execute("CREATE INDEX IF NOT EXISTS on_call_employee_date ON on_call (employee, date)")
+
+    @contextmanager
+    def _connect(self):
+        # Commits (or rolls back) the transaction and closes the connection
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def record(self, names: np.ndarray, start_date: date, weights: np.ndarray):
+        # Saves a (day x slot) array of employee names from start_date, the days already
+        # on the history (e.g. a re-planned result) are replaced
+        end_date = start_date + timedelta(days=len(names) - 1)
+        rows = [((start_date + timedelta(days=day)).isoformat(), slot, name, float(weights[day]))
+                for day, names_of_day in enumerate(names.tolist())
+                for slot, name in enumerate(names_of_day) if name]
+        with self._connect() as connection:
+            connection.execute("DELETE FROM on_call WHERE date BETWEEN ? AND ?",
+                               (start_date.isoformat(), end_date.isoformat()))
+            connection.executemany("INSERT INTO on_call (date, slot, employee, weight) VALUES (?, ?, ?, ?)", rows)
+        logging.info(f"{len(names)} days recorded on the history {self.path}")
+
+    def load(self, employees: list, before: date, since=None):
+        # Returns the weighted on-call load of each employee before a date (and since a date)
+        query = "SELECT employee, SUM(weight) FROM on_call WHERE date < ?"
+        parameters = [before.isoformat()]
+        if since is not None:
+            query += " AND date >= ?"
+            parameters.append(since.isoformat())
+        with self._connect() as connection:
+            loads = dict(connection.execute(f"{query} GROUP BY employee", parameters).fetchall())
+        return np.array([loads.get(employee, 0.0) for employee in employees])
+
+
+class History:
+    # Load of each employee before the template (in the order of the codebook) and weight of each
+    # day of the template. It is loaded once per run and used by HistoryFairnessEvaluation
+    def __init__(self, loads: np.ndarray, weights: np.ndarray, tolerance=HISTORY_TOLERANCE):
+        if tolerance <= 0:
+            raise ValueError(f"history tolerance must be higher than 0, not {tolerance}")
+        self.loads = loads
+        self.weights = weights
+        self.tolerance = tolerance
+
+    @staticmethod
+    def weights_from_config(config: dict):
+        start_date = datetime.strptime(config["startDate"], "%d/%m/%Y").date()
+        return day_weights(start_date, 7 * config["weekQuantity"], config.get("weekendWeight", WEEKEND_WEIGHT),
+                           config.get("holidayWeight", HOLIDAY_WEIGHT), config.get("holidays", []))
+
+    @staticmethod
+    def from_config(config: dict, employees: list):
+        # Returns the history of the template, None when it has no history file.
+        # historyWeeks limits the history to the last weeks before the template (0 is all of it)
+        if not config.get("history"):
+            return None
+        start_date = datetime.strptime(config["startDate"], "%d/%m/%Y").date()
+        history_weeks = config.get("historyWeeks", 0)
+        since = start_date - timedelta(weeks=history_weeks) if history_weeks else None
+        loads = HistoryStore(config["history"]).load(employees, start_date, since)
+        logging.info(f"history loaded from {config['history']}: "
+                     f"{', '.join(f'{e}: {load:.1f}' for e, load in zip(employees, loads))}")
+        return History(loads, History.weights_from_config(config), config.get("historyTolerance", HISTORY_TOLERANCE))
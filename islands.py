@@ -0,0 +1,80 @@
+import logging
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from convergence import EPOCHS, Convergence
+from generation import Generation
+
+
+def _create_island(generation_args: dict, seed: int):
+    random.seed(seed)
+    return Generation.create_generation(**generation_args), random.getstate()
+
+
+def _run_island(generation: Generation, number_of_epochs: int, immigrants: list, random_state: tuple, label: str,
+                convergence: Convergence, metrics):
+    # Runs one island until number_of_epochs in a worker process. The immigrants replace
+    # the last offspring of the island, the elites of the previous epoch are kept.
+    # The convergence of the island is returned, so its epochs without improvement go on on the next round
+    random.setstate(random_state)
+    if immigrants:
+        generation.populations = generation.populations[:-len(immigrants)] + immigrants
+    best_population, best_invalid_population = generation.run(number_of_epochs, label=label,
+                                                              convergence=convergence, metrics=metrics, final=False)
+    return generation, best_population, best_invalid_population, random.getstate(), convergence
+
+
+def _is_better(population, best_population):
+    return population is not None and (best_population is None or best_population.score < population.score)
+
+
+def run_islands(generation_args: dict, number_of_epochs: int, islands: int, migration_interval: int,
+                convergence=None, metrics=None):
+    # Runs independent generations (islands) on a process pool. Every migration_interval epochs
+    # the elites of each island migrate to the next one (ring topology).
+    # It stops as soon as an island finds a valid schedule with the target score of convergence,
+    # the stagnation and time limit of convergence are checked on every migration.
+    # Each island writes its measurements with metrics.for_island.
+    # Returns the best valid and invalid populations and the number of epochs run
+    seeds = [random.randrange(2 ** 32) for island in range(islands)]
+    logging.info(f"running {islands} islands with seeds {seeds}")
+
+    convergence = convergence or Convergence()
+    convergence.begin()
+    best_population = None
+    best_invalid_population = None
+    with ProcessPoolExecutor(max_workers=min(islands, os.cpu_count())) as executor:
+        states = list(executor.map(_create_island, [generation_args] * islands, seeds))
+        generations = [generation for generation, _ in states]
+        random_states = [random_state for _, random_state in states]
+        immigrants = [[] for island in range(islands)]
+        island_metrics = [metrics and metrics.for_island(island) for island in range(islands)]
+        island_convergences = [convergence.for_island() for island in range(islands)]
+        epoch = 0
+        while True:
+            if epoch >= number_of_epochs:
+                convergence.stop(EPOCHS, epoch)
+                break
+            epoch = min(epoch + migration_interval, number_of_epochs)
+            futures = [executor.submit(_run_island, generations[island], epoch, immigrants[island],
+                                       random_states[island], f"island {island} - ", island_convergences[island],
+                                       island_metrics[island])
+                       for island in range(islands)]
+            for island, future in enumerate(futures):
+                generations[island], island_best, island_best_invalid, random_states[island], \
+                    island_convergences[island] = future.result()
+                if _is_better(island_best, best_population):
+                    best_population = island_best
+                if best_population is None and _is_better(island_best_invalid, best_invalid_population):
+                    best_invalid_population = island_best_invalid
+
+            emigrants = [generation.populations[:generation.elitism] for generation in generations]
+            immigrants = [emigrants[island - 1] for island in range(islands)]
+            logging.info(f"epoch: {epoch} - best score of all islands: "
+                         f"{(best_population or best_invalid_population).score:.2f}")
+            reason = convergence.update(epoch, best_population or best_invalid_population, best_population)
+            if reason:
+                convergence.stop(reason, epoch)
+                break
+    return best_population, best_invalid_population, epoch
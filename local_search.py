@@ -0,0 +1,121 @@
+import logging
+import math
+import random
+import time
+
+import numpy as np
+
+from population import Population
+
+# Neighbors of the current schedule evaluated together on each step
+BATCH_SIZE = 32
+# Default score points a worse neighbor can lose and still be accepted at the start,
+# the temperature goes down to 0 at the end of the time budget
+TEMPERATURE = 1.0
+# Added to the score of the valid schedules, so a valid schedule is always better than an invalid one
+VALID_BONUS = 101
+
+
+def _objective(population: Population):
+    return population.score + (0 if population.invalid else VALID_BONUS)
+
+
+class LocalSearch:
+    # Refines the best schedule of the genetic engine with simulated annealing. The neighbors of the
+    # current schedule come from three moves on the blocks of the generation (see Population.create_blocks):
+    # replace: one employee of a block is replaced by another available employee (Population.mutate)
+    # swap: the employees of a slot of two blocks are exchanged
+    # shift: the boundary between two consecutive blocks moves by one day on a slot
+    # A neighbor changes a few days of the current schedule, which is its parent: on schedules of
+    # DELTA_MIN_CELLS or more it is evaluated from the aggregates of the current schedule (see
+    # BatchEvaluation._evaluate_delta), the smaller ones are faster in one batch with the other neighbors.
+    # The fixed days are not part of the blocks, so they never change
+    def __init__(self, generation, time_limit: float, target_score=100, temperature=TEMPERATURE):
+        self.codebook = generation.codebook
+        self.on_call_not_possible = generation.on_call_not_possible
+        self.blocks = generation.blocks
+        self.batch_evaluation = generation.batch_evaluation
+        self.time_limit = time_limit
+        self.target_score = target_score
+        self.temperature = temperature
+        # Blocks followed by a block with the same slots starting on the next day
+        self.adjacent = [index for index in range(len(self.blocks) - 1)
+                         if self.blocks[index][1] == self.blocks[index + 1][0]
+                         and self.blocks[index][3] == self.blocks[index + 1][3]]
+        self.moves = 0
+        self.accepted = 0
+
+    def run(self, population: Population):
+        # Returns the best schedule found from population in time_limit seconds,
+        # it stops before when a valid schedule reaches target_score
+        start = time.perf_counter()
+        current = Population(population.on_call_schedule.copy(), self.on_call_not_possible, self.codebook)
+        self.batch_evaluation.evaluate([current])
+        best = initial = current
+        moves = [self._replace, self._swap] + ([self._shift] if self.adjacent else [])
+        while self.blocks:
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.time_limit or (not best.invalid and best.score >= self.target_score):
+                break
+            neighbors = [neighbor for neighbor in (random.choice(moves)(current) for _ in range(BATCH_SIZE))
+                         if neighbor is not None]
+            if not neighbors:
+                continue
+            self.batch_evaluation.evaluate(neighbors)
+            self.moves += len(neighbors)
+            neighbor = max(neighbors, key=_objective)
+            delta = _objective(neighbor) - _objective(current)
+            temperature = self.temperature * (1 - elapsed / self.time_limit)
+            if delta >= 0 or (temperature > 0 and random.random() < math.exp(delta / temperature)):
+                current = neighbor
+                self.accepted += 1
+                if _objective(current) > _objective(best):
+                    best = current
+
+        validity = "invalid" if best.invalid else "valid"
+        logging.info(f"local search: score {initial.score:.2f} -> {best.score:.2f} ({validity} schedule) in "
+                     f"{time.perf_counter() - start:.2f}s - moves: {self.moves} - accepted: {self.accepted}")
+        return best
+
+    def _neighbor(self, population: Population, schedule: np.ndarray):
+        neighbor = Population(schedule, self.on_call_not_possible, self.codebook)
+        neighbor.parents = (population,)
+        return neighbor
+
+    def _replace(self, population: Population):
+        neighbor = self._neighbor(population, population.on_call_schedule.copy())
+        neighbor.mutate(self.blocks)
+        return neighbor
+
+    def _swap(self, population: Population):
+        # The employees of the first day of the two slots are exchanged on the whole blocks,
+        # when both are available on the other block and are not part of it yet
+        if len(self.blocks) < 2:
+            return None
+        block_0, block_1 = random.sample(self.blocks, 2)
+        schedule = population.on_call_schedule.copy()
+        slot_0, slot_1 = random.randrange(block_0[3]), random.randrange(block_1[3])
+        employee_0, employee_1 = schedule[block_0[0], slot_0], schedule[block_1[0], slot_1]
+        if employee_0 == employee_1 or max(employee_0, employee_1) >= self.codebook.blank:
+            return None
+        days_0, days_1 = schedule[block_0[0]:block_0[1]], schedule[block_1[0]:block_1[1]]
+        if employee_1 not in block_0[2] or employee_0 not in block_1[2] or employee_1 in days_0 \
+                or employee_0 in days_1:
+            return None
+        days_0[:, slot_0] = employee_1
+        days_1[:, slot_1] = employee_0
+        return self._neighbor(population, schedule)
+
+    def _shift(self, population: Population):
+        # The last day of a block takes the employee of the next block on a slot, or
+        # the first day of the next block takes the employee of the block
+        index = random.choice(self.adjacent)
+        boundary = self.blocks[index][1]
+        slot = random.randrange(self.blocks[index][3])
+        day, source = (boundary - 1, boundary) if random.random() < 0.5 else (boundary, boundary - 1)
+        schedule = population.on_call_schedule.copy()
+        employee = schedule[source, slot]
+        if employee >= self.codebook.blank or employee in schedule[day] or self.on_call_not_possible[day, employee]:
+            return None
+        schedule[day, slot] = employee
+        return self._neighbor(population, schedule)
@@ -1,87 +1,213 @@
+import argparse
+import importlib
 import json
 import logging
 import os
+import random
+import time
 from datetime import datetime, timedelta
 
-from generation import Generation
+# The engines and the modules they need (numpy, pandas, ortools) are only imported
+# by the commands which solve a template, see load_engine
+ENGINES = {
+    "genetic": "engine.genetic_engine.GeneticEngine",
+    "exact": "engine.exact_engine.ExactEngine"
+}
+TEMPLATE = "./resources/template.json"
+
+
+def load_engine(name: str):
+    module, engine = ENGINES[name].rsplit(".", 1)
+    return getattr(importlib.import_module(module), engine)
 
 
 def map_on_call_not_possible(config: dict):
+    # Returns a (day x employee) boolean array, True when the employee cannot do on-call on the day.
+    # The employees follow the order of employeeNames
+    import numpy as np
+
     start_date = datetime.strptime(config["startDate"], "%d/%m/%Y").date()
     week_quantity = config["weekQuantity"]
-    employee_names = [e.lower() for e in config["employeeNames"]]
+    employee_index = {e.lower(): index for index, e in enumerate(config["employeeNames"])}
 
-    obj = {}
-    for employee_name in employee_names:
-        obj[employee_name] = []
+    on_call_not_possible = np.zeros((7 * week_quantity, len(employee_index)), dtype=bool)
     for days in range(7 * week_quantity):
-        for employee_name in employee_names:
-            employee_name = employee_name.lower()
-            names = config[(start_date + timedelta(days=days)).strftime("%d/%m/%Y")].lower()
-            obj[employee_name].append(employee_name if employee_name in names else "")
-    return obj
+        names = config[(start_date + timedelta(days=days)).strftime("%d/%m/%Y")].lower().split(",")
+        for name in names:
+            if name.strip() in employee_index:
+                on_call_not_possible[days, employee_index[name.strip()]] = True
+    return on_call_not_possible
 
 
-def run_algorithm():
-    with open("./resources/template.json", "r") as f:
-        config = json.load(f)
+def map_on_call_slots(config: dict):
+    # Returns how many employees do on-call on each day: numberOfEmployeesDoingOnCall, or the value of
+    # the day of the week on onCallByWeekday (i.e. {"Saturday": 1}) or of the date on onCallByDate
+    import numpy as np
 
-    week_quantity = config["weekQuantity"]
-    number_of_populations = config["numberOfPopulations"]
-    number_of_epochs = config["numberOfEpochs"]
-    number_of_employees_doing_on_call = config["numberOfEmployeesDoingOnCall"]
+    start_date = datetime.strptime(config["startDate"], "%d/%m/%Y").date()
+    by_weekday = config.get("onCallByWeekday", {})
+    by_date = config.get("onCallByDate", {})
+    slots = np.full(7 * config["weekQuantity"], config["numberOfEmployeesDoingOnCall"], dtype=np.int64)
+    for days in range(len(slots)):
+        day = start_date + timedelta(days=days)
+        slots[days] = by_date.get(day.strftime("%d/%m/%Y"), by_weekday.get(day.strftime("%A"), slots[days]))
+    if (slots < 1).any():
+        raise ValueError("every day needs at least one employee doing on-call")
+    return slots
+
+
+def solve(config: dict, engine=None, resume=False, fixed_schedule=None, fixed_days=None):
+    # Finds the schedule of a template with an engine, keeping fixed_schedule on fixed_days.
+    # Returns the engine, the best valid and the best invalid populations and the seconds it took
+    if config.get("seed") is not None:
+        random.seed(config["seed"])
+
+    engine_name = engine or config.get("engine", "genetic")
     employee_names = [e.lower() for e in config["employeeNames"]]
     on_call_not_possible = map_on_call_not_possible(config)
 
-    generation = Generation.create_generation(number_of_populations, number_of_employees_doing_on_call, employee_names,
-                                              week_quantity, on_call_not_possible)
-    best_population = None
-    best_invalid_population = None
-    while generation.epoch < number_of_epochs and (best_population is None or best_population.score < 100):
-        new_best_population = generation.get_best_population()
-        if best_population is None or best_population.score < new_best_population.score:
-            if not new_best_population.invalid:
-                best_population = new_best_population
-            else:
-                best_invalid_population = new_best_population
-
-        invalid_str = " (invalid schedule)" if new_best_population.invalid else " (valid schedule)"
-        logging.info(f"epoch: {generation.epoch} - score: {new_best_population.score:.2f} {invalid_str}")
-        logging.debug(new_best_population.get_score_to_str())
-        generation.next_generation()
+    start = time.perf_counter()
+    engine = load_engine(engine_name)(config, employee_names, on_call_not_possible, resume=resume,
+                                      fixed_schedule=fixed_schedule, fixed_days=fixed_days,
+                                      slots=map_on_call_slots(config))
+    best_population, best_invalid_population = engine.solve()
+    seconds = time.perf_counter() - start
+    logging.info(f"{engine_name} engine finished in {seconds:.2f}s")
+    return engine, best_population, best_invalid_population, seconds
+
 
+def export_result(config: dict, population, name: str, output_dir: str):
+    # Saves the csv result and, with the same name, the other formats of exportFormats
+    from exporters import EXPORTERS
+    from population import Population
+
+    start_date = datetime.strptime(config["startDate"], "%d/%m/%Y").date()
+    population.save(start_date, name, output_dir, roles=config.get("roles"))
+    logging.info(f"Result was saved on {os.path.join(output_dir, name)}")
+
+    possibilities = None
+    for export_format in config.get("exportFormats", []):
+        if export_format == "csv":
+            continue
+        if export_format == "ics" and possibilities is None:
+            from engine.genetic_engine import CACHE_DIR
+
+            possibilities = Population.create_possibilities(
+                population.on_call_schedule.shape[1], population.employees, config["weekQuantity"],
+                population.on_call_not_possible, CACHE_DIR, map_on_call_slots(config))
+        path = f"{os.path.splitext(name)[0]}{EXPORTERS[export_format].extension}"
+        population.save(start_date, path, output_dir, export_format, possibilities, config.get("roles"))
+        logging.info(f"Result was exported on {os.path.join(output_dir, path)}")
+
+
+def save_result(config: dict, best_population, best_invalid_population, name="result.csv",
+                output_dir="./resources"):
+    # Saves the best valid population or else the best invalid one. A valid result
+    # is also recorded on the history of the template, when it has one
+    start_date = datetime.strptime(config["startDate"], "%d/%m/%Y").date()
     if best_population is not None:
-        logging.debug(best_population.on_call_schedule)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(best_population.to_data_frame())
         logging.info(f"Best score: {best_population.score:.2f}")
-        logging.info("Result was saved on ./resources/result.csv")
-        best_population.save(datetime.strptime(config["startDate"], "%d/%m/%Y").date())
+        export_result(config, best_population, name, output_dir)
+        if config.get("history"):
+            from history import History, HistoryStore
+
+            HistoryStore(config["history"]).record(best_population.codebook.decode(best_population.on_call_schedule),
+                                                   start_date, History.weights_from_config(config))
+    elif best_invalid_population is None:
+        logging.info("No result was found")
     else:
         logging.info("No valid result was found - run again")
         logging.info(f"Best invalid score: {best_invalid_population.score:.2f}")
-        logging.info("Result was saved on ./resources/invalid-result.csv")
-        best_invalid_population.save(datetime.strptime(config["startDate"], "%d/%m/%Y").date(), "invalid-result.csv")
+        export_result(config, best_invalid_population, f"invalid-{name}", output_dir)
 
 
-def create_template():
-    date_str = input("Enter the date (dd/MM/YYYY) to start calculating the on-call support:\n").strip()
-    date = datetime.strptime(date_str, "%d/%m/%Y").date()
+def run_algorithm(islands=None, engine=None, resume=False, template=TEMPLATE):
+    with open(template, "r") as f:
+        config = json.load(f)
+
+    if islands:
+        config["islands"] = islands
+    _, best_population, best_invalid_population, _ = solve(config, engine, resume)
+    save_result(config, best_population, best_invalid_population)
 
-    week_quantity = int(input("Enter the quantity of weeks to be calculated:\n").strip())
+
+def replan_algorithm(engine=None, published_weeks=None, result="./resources/result.csv", template=TEMPLATE):
+    # Plans again the weeks of result affected by the changes of template,
+    # the finished and published weeks and the weeks not affected are kept
+    from codebook import Codebook
+    from replan import load_schedule, select_fixed_days
+
+    with open(template, "r") as f:
+        config = json.load(f)
+
+    codebook = Codebook([e.lower() for e in config["employeeNames"]])
+    schedule, known = load_schedule(config, result, codebook, map_on_call_slots(config))
+    if published_weeks is None:
+        published_weeks = config.get("publishedWeeks", 0)
+    fixed_days = select_fixed_days(config, schedule, known, map_on_call_not_possible(config), codebook,
+                                   published_weeks, config.get("replanMargin", 1))
+    if fixed_days.all():
+        logging.info("No week needs to be planned again")
+        return
+    _, best_population, best_invalid_population, _ = solve(config, engine, fixed_schedule=schedule,
+                                                           fixed_days=fixed_days)
+    save_result(config, best_population, best_invalid_population, os.path.basename(result),
+                os.path.dirname(result))
+
+
+def create_template(date_str: str, week_quantity: int, template=TEMPLATE):
+    date = datetime.strptime(date_str, "%d/%m/%Y").date()
     config = {
         "weekQuantity": week_quantity,
         "numberOfPopulations": 40,
-        "numberOfEpochs": 300,
+        "numberOfEpochs": 100,
+        "targetScore": 100,
+        "stagnationEpochs": 30,
+        "timeLimit": 0,
+        "stallEpochs": 10,
+        "mutationBoost": 1.5,
+        "selection": "tournament",
+        "tournamentSize": 3,
+        "elitism": 2,
+        "mutationRate": 0.2,
+        "islands": 1,
+        "migrationInterval": 10,
+        "engine": "genetic",
+        "solverTimeLimit": 60,
+        "seed": None,
+        "checkpointInterval": 0,
+        "publishedWeeks": 0,
+        "replanMargin": 1,
+        "metrics": None,
+        "metricsFormat": "jsonl",
+        "profile": None,
+        "exportFormats": [],
+        "history": None,
+        "historyWeeks": 0,
+        "historyTolerance": 5,
+        "weekendWeight": 1.5,
+        "holidayWeight": 2,
+        "holidays": [],
+        "localSearchTime": 0,
+        "localSearchTemperature": 1.0,
+        "fitnessCacheSize": 4096,
+        "weekCacheSize": 0,
         "numberOfEmployeesDoingOnCall": 2,
+        "onCallByWeekday": {},
+        "onCallByDate": {},
+        "roles": [],
         "employeeNames": ["A", "B", "C"],
         "startDate": date.strftime("%d/%m/%Y")
     }
     for days in range(7 * week_quantity):
         config[(date + timedelta(days=days)).strftime("%d/%m/%Y")] = ""
 
-    with open("./resources/template.json", "w") as f:
+    with open(template, "w") as f:
         f.write(json.dumps(config, indent=2, sort_keys=False))
 
-    logging.info("template saved on ./resources/template.json")
+    logging.info(f"template saved on {template}")
 
 
 def configure_logging():
@@ -98,11 +224,92 @@ def configure_logging():
     logger.addHandler(stdout_handler)
 
 
+def create_pdf(personal_data=None, roster=None, result="./resources/result.csv", output_dir="./resources",
+               workers=None):
+    # Creates the timesheet of personal_data (./resources/personal-data.json by default) or,
+    # with roster, the timesheets of every employee of the roster file
+    import pdf_writer
+
+    if roster is not None:
+        with open(roster, "r") as f:
+            pdf_writer.write_pdfs(json.load(f), result, output_dir, workers)
+        return
+    with open(personal_data or "./resources/personal-data.json", "r") as f:
+        path = pdf_writer.write_pdf(json.load(f), result, output_dir)
+    logging.info(f"pdf saved on {path}")
+
+
+def create_option_parsers(default=None):
+    # Returns the parent parsers of the options of the engine, solve and replan. The commands get
+    # them with argparse.SUPPRESS, so an option given before the command is not overwritten by the default
+    engine_options = argparse.ArgumentParser(add_help=False)
+    engine_options.add_argument("--engine", choices=ENGINES.keys(), default=default,
+                                help="engine used to find the schedule, overrides the template")
+    solve_options = argparse.ArgumentParser(add_help=False)
+    solve_options.add_argument("--islands", type=int, default=default,
+                               help="number of islands running in parallel, overrides the template")
+    solve_options.add_argument("--resume", action="store_true", default=default or False,
+                               help="continue the run saved on ./resources/checkpoint.npz")
+    replan_options = argparse.ArgumentParser(add_help=False)
+    replan_options.add_argument("--published-weeks", type=int, default=default,
+                                help="weeks of the result kept by the re-planning, overrides the template")
+    return engine_options, solve_options, replan_options
+
+
+def create_parser():
+    engine_options, solve_options, replan_options = create_option_parsers()
+    command_engine_options, command_solve_options, command_replan_options = create_option_parsers(argparse.SUPPRESS)
+
+    # Without a command the interactive menu is shown, the options of solve and replan still apply
+    parser = argparse.ArgumentParser(description="On-call support planning",
+                                     parents=[engine_options, solve_options, replan_options])
+    commands = parser.add_subparsers(dest="command")
+
+    template = commands.add_parser("template", help="create the template of the input data")
+    template.add_argument("--start-date", required=True, help="first day of the schedule (dd/MM/YYYY)")
+    template.add_argument("--weeks", type=int, required=True, help="quantity of weeks to be calculated")
+    template.add_argument("--output", default=TEMPLATE, help="path of the template")
+
+    solve_command = commands.add_parser("solve", help="find the schedule of a template",
+                                        parents=[command_engine_options, command_solve_options])
+    solve_command.add_argument("--template", default=TEMPLATE, help="path of the template")
+
+    replan = commands.add_parser("replan", help="plan again the result after changes of the template",
+                                 parents=[command_engine_options, command_replan_options])
+    replan.add_argument("--template", default=TEMPLATE, help="path of the template")
+    replan.add_argument("--result", default="./resources/result.csv", help="result planned again")
+
+    pdf = commands.add_parser("pdf", help="create the timesheet pdf of the result")
+    pdf.add_argument("--personal-data", help="personal data of the employee, ./resources/personal-data.json "
+                                             "by default")
+    pdf.add_argument("--roster", help="list of personal data, creates the timesheet of every employee")
+    pdf.add_argument("--result", default="./resources/result.csv", help="schedule of the timesheets")
+    pdf.add_argument("--output-dir", default="./resources", help="directory of the pdf files")
+    pdf.add_argument("--workers", type=int, help="number of timesheets created in parallel")
+    return parser
+
+
 if __name__ == "__main__":
+    args = create_parser().parse_args()
+
     configure_logging()
-    options = int(input("Enter: \n1 - Create template for input data\n2 - Run algorithm\n").strip())
+    if args.command == "template":
+        create_template(args.start_date, args.weeks, args.output)
+    elif args.command == "solve":
+        run_algorithm(args.islands, args.engine, args.resume, args.template)
+    elif args.command == "replan":
+        replan_algorithm(args.engine, args.published_weeks, args.result, args.template)
+    elif args.command == "pdf":
+        create_pdf(args.personal_data, args.roster, args.result, args.output_dir, args.workers)
+    else:
+        options = int(input("Enter: \n1 - Create template for input data\n2 - Run algorithm\n"
+                            "3 - Re-plan the result after changes of the template\n").strip())
 
-    if options == 1:
-        create_template()
-    elif options == 2:
-        run_algorithm()
+        if options == 1:
+            date_str = input("Enter the date (dd/MM/YYYY) to start calculating the on-call support:\n").strip()
+            week_quantity = int(input("Enter the quantity of weeks to be calculated:\n").strip())
+            create_template(date_str, week_quantity)
+        elif options == 2:
+            run_algorithm(args.islands, args.engine, args.resume)
+        elif options == 3:
+            replan_algorithm(args.engine, args.published_weeks)
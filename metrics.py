@@ -0,0 +1,121 @@
+import cProfile
+import json
+import logging
+import os
+
+import numpy as np
+
+METRICS_FORMATS = ["jsonl", "prometheus"]
+
+
+class Metrics:
+    # Writes the measurements of every epoch of a Generation on path, as one json object
+    # per line (jsonl) or as a Prometheus text file with the last epoch (prometheus).
+    # When profile is set, the run is captured by cProfile and its stats are saved on it
+    def __init__(self, path: str, metrics_format="jsonl", profile=None, island=None):
+        if metrics_format not in METRICS_FORMATS:
+            raise ValueError(f"metrics format must be one of {METRICS_FORMATS}, not {metrics_format}")
+        self.path = path
+        self.metrics_format = metrics_format
+        self.profile = profile
+        self.island = island
+        self.profiler = None
+
+    def for_island(self, island: int):
+        # Returns the metrics of an island. The islands append to the same jsonl file,
+        # every island has its own Prometheus file and the islands are not profiled
+        path = self.path
+        if path and self.metrics_format == "prometheus":
+            root, extension = os.path.splitext(path)
+            path = f"{root}-island-{island}{extension}"
+        return Metrics(path, self.metrics_format, island=island)
+
+    def begin(self):
+        if self.path and self.metrics_format == "jsonl" and self.island is None and os.path.exists(self.path):
+            os.remove(self.path)
+        if self.profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def close(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.profile)
+            self.profiler = None
+            logging.info(f"profile saved on {self.profile}")
+
+    def record(self, generation):
+        # Called after get_best_population, so the populations are evaluated and the elites come first.
+        # The seconds are the time spent since the previous record: the construction of the first
+        # populations, the crossover and mutation of the offspring, their evaluation and the selection
+        if not self.path:
+            return
+        populations = generation.populations
+        criteria = np.array([[evaluation.score for evaluation in population.evaluation]
+                             for population in populations], dtype=float)
+        scores = np.array([population.score for population in populations], dtype=float)
+        schedules = np.stack([population.on_call_schedule for population in populations])
+        record = {
+            "epoch": generation.epoch,
+            "seconds": {
+                **generation.timings,
+                "evaluation": {name: seconds - generation.recorded_evaluation_timings.get(name, 0.0)
+                               for name, seconds in generation.batch_evaluation.timings.items()}
+            },
+            "score": self._statistics(scores),
+            "criteria": {type(evaluation).__name__: self._statistics(criteria[:, index])
+                         for index, evaluation in enumerate(populations[0].evaluation)},
+            "valid_ratio": float(np.mean([not population.invalid for population in populations])),
+            # Fraction of the slots different from the best population and number of different schedules
+            "diversity": float((schedules != schedules[0]).mean()),
+            "unique_populations": len({schedule.tobytes() for schedule in schedules}),
+            "mutation_rate": generation.mutation_rate,
+            # Hits and misses of the evaluation caches since the beginning of the run
+            "cache": generation.batch_evaluation.cache_stats()
+        }
+        if self.island is not None:
+            record["island"] = self.island
+
+        if self.metrics_format == "jsonl":
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        else:
+            with open(f"{self.path}.tmp", "w") as f:
+                f.write(self._to_prometheus(record))
+            os.replace(f"{self.path}.tmp", self.path)
+
+    @staticmethod
+    def _statistics(values: np.ndarray):
+        return {"best": float(values.max()), "mean": float(values.mean()), "worst": float(values.min())}
+
+    @staticmethod
+    def _to_prometheus(record: dict):
+        lines = []
+
+        def gauge(name: str, value, help_text: str, labels=None):
+            if not lines or not lines[-1].startswith(f"on_call_{name}"):
+                lines.extend([f"# HELP on_call_{name} {help_text}", f"# TYPE on_call_{name} gauge"])
+            labels = ",".join(f'{key}="{label}"' for key, label in (labels or {}).items())
+            lines.append(f"on_call_{name}{{{labels}}} {value}" if labels else f"on_call_{name} {value}")
+
+        gauge("epoch", record["epoch"], "Epoch of the last record")
+        for phase, seconds in record["seconds"].items():
+            if phase != "evaluation":
+                gauge("seconds", seconds, "Seconds spent on each phase of the epoch", {"phase": phase})
+        for evaluation, seconds in record["seconds"]["evaluation"].items():
+            gauge("seconds", seconds, "", {"phase": "evaluation", "evaluation": evaluation})
+        for statistic, value in record["score"].items():
+            gauge("score", value, "Score of the populations", {"statistic": statistic})
+        for criterion, statistics in record["criteria"].items():
+            for statistic, value in statistics.items():
+                gauge("criterion_score", value, "Score of each evaluation of the populations",
+                      {"criterion": criterion, "statistic": statistic})
+        gauge("valid_ratio", record["valid_ratio"], "Fraction of valid populations")
+        gauge("diversity", record["diversity"], "Fraction of the slots different from the best population")
+        gauge("unique_populations", record["unique_populations"], "Number of different populations")
+        gauge("mutation_rate", record["mutation_rate"], "Mutation rate of the epoch")
+        for counter in ["hits", "misses", "entries"]:
+            for cache, stats in record["cache"].items():
+                gauge(f"cache_{counter}", stats[counter], f"{counter.capitalize()} of the evaluation caches",
+                      {"cache": cache})
+        return "\n".join(lines) + "\n"
@@ -1,17 +1,22 @@
+import csv
 import json
 import logging
 import os
 import typing as T
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 
-import numpy as np
-import pandas as pd
-import pypdf
-import pypdf.constants
-import pypdf.generic
+# pypdf is only imported when a pdf is created, so the menu and create_template start fast
+if T.TYPE_CHECKING:
+    import pypdf
 
+TEMPLATE = "./public/pdf-template.pdf"
+
+
+def _fix_acroform(writer: "pypdf.PdfWriter", reader: "pypdf.PdfReader") -> None:
+    import pypdf.constants
+    import pypdf.generic
 
-def _fix_acroform(writer: pypdf.PdfWriter, reader: pypdf.PdfReader) -> None:
     reader_root = T.cast(pypdf.generic.DictionaryObject, reader.trailer[pypdf.constants.TrailerKeys.ROOT])
     acro_form_key = pypdf.generic.NameObject(pypdf.constants.CatalogDictionary.ACRO_FORM)
 
@@ -24,11 +29,25 @@ def _fix_acroform(writer: pypdf.PdfWriter, reader: pypdf.PdfReader) -> None:
     writer.set_need_appearances_writer()
 
 
-def read_schedule(schedule_name):
-    df = pd.read_csv("./resources/result.csv")
-    df = df[(df["On-Call 1"] == schedule_name) | (df["On-Call 2"] == schedule_name)]
-    df["Week"] = df["Date"].apply(lambda d: datetime.strptime(d, "%d/%m/%Y").date().isocalendar().week)
-    return df
+def read_schedules(result="./resources/result.csv"):
+    # Reads result once and returns the days of each employee grouped by ISO week:
+    # {employee: {(year, week): [date, ...]}}, the days and the weeks are sorted
+    schedules = {}
+    with open(result, "r", newline="") as f:
+        rows = csv.DictReader(f)
+        slots = [column for column in rows.fieldnames if column.startswith("On-Call")]
+        for row in rows:
+            date = datetime.strptime(row["Date"], "%d/%m/%Y").date()
+            week = date.isocalendar()[:2]
+            for slot in slots:
+                if row[slot]:
+                    schedules.setdefault(row[slot], {}).setdefault(week, []).append(date)
+    return {employee: {week: sorted(set(days)) for week, days in sorted(schedule.items())}
+            for employee, schedule in schedules.items()}
+
+
+def read_schedule(schedule_name, result="./resources/result.csv"):
+    return read_schedules(result).get(schedule_name, {})
 
 
 def write_header(config, writer):
@@ -43,14 +62,12 @@ def write_header(config, writer):
     })
 
 
-def write_page(weeks, schedule, writer):
+def write_page(schedule, writer):
     fields = {}
-    for wk_index in range(len(weeks)):
-        fields[f"KWRow{wk_index + 1}"] = weeks[wk_index]
+    for wk_index, ((_, week), days) in enumerate(schedule.items()):
+        fields[f"KWRow{wk_index + 1}"] = week
 
-        df = schedule[schedule["Week"] == weeks[wk_index]]
-        for index, row in df.iterrows():
-            date = datetime.strptime(row["Date"], "%d/%m/%Y").date()
+        for date in days:
             date_index = (wk_index * 7) + date.weekday() + 1
             fields[f"Datum{date_index}"] = date.strftime("%m/%d/%Y")
 
@@ -61,27 +78,80 @@ def write_page(weeks, schedule, writer):
         writer.update_page_form_field_values(page, fields=fields)
 
 
-def write_pdf():
-    with open("./resources/personal-data.json", "r") as f:
-        config = json.load(f)
+def fill_pdf(config, schedule, reader, output_dir="./resources"):
+    # Fills the timesheet of the employee of config with the days of schedule (see read_schedules)
+    # using the template already parsed by reader and returns the path of the pdf file
+    import pypdf
 
-    schedule = read_schedule(config["scheduleName"].lower())
-    reader = pypdf.PdfReader("./public/pdf-template.pdf")
+    if not schedule:
+        raise ValueError(f"{config['scheduleName']} does not do on-call in the schedule")
 
     writer = pypdf.PdfWriter()
     _fix_acroform(writer, reader)
 
     writer.append_pages_from_reader(reader)
     write_header(config, writer)
+    write_page(schedule, writer)
 
-    weeks = np.sort(schedule["Week"].unique()).tolist()
-    write_page(weeks, schedule, writer)
-
-    date = datetime.strptime(schedule["Date"].iloc[0], "%d/%m/%Y").date()
+    date = next(iter(schedule.values()))[0]
 
     filename = f"{date.strftime('%b')}_{date.strftime('%Y')}_{config['Name'].replace(' ', '_')}_{config['Vorname'].replace(' ', '_')}"
-    with open(f"./resources/{filename}.pdf", "wb") as output_stream:
+    path = os.path.join(output_dir, f"{filename}.pdf")
+    with open(path, "wb") as output_stream:
         writer.write(output_stream)
+    return path
+
+
+def write_pdf(config=None, result="./resources/result.csv", output_dir="./resources"):
+    # Fills the timesheet of the employee of config (./resources/personal-data.json by default)
+    # with the days of result and returns the path of the pdf file
+    if config is None:
+        with open("./resources/personal-data.json", "r") as f:
+            config = json.load(f)
+
+    import pypdf
+
+    schedule = read_schedule(config["scheduleName"].lower(), result)
+    return fill_pdf(config, schedule, pypdf.PdfReader(TEMPLATE), output_dir)
+
+
+# Template parsed once by each worker process of write_pdfs
+_reader = None
+
+
+def _load_template(template: str):
+    import pypdf
+
+    global _reader
+    _reader = pypdf.PdfReader(template)
+
+
+def _fill_pdf_worker(config, schedule, output_dir):
+    return fill_pdf(config, schedule, _reader, output_dir)
+
+
+def write_pdfs(roster=None, result="./resources/result.csv", output_dir="./resources", workers=None):
+    # Fills the timesheets of every employee of roster (./resources/roster.json by default, a list of
+    # personal-data entries) in parallel. The schedule is read once and each worker parses the template
+    # once. Returns the path of the pdf file of each employee (None when it failed)
+    if roster is None:
+        with open("./resources/roster.json", "r") as f:
+            roster = json.load(f)
+
+    schedules = read_schedules(result)
+    paths = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_template, initargs=(TEMPLATE,)) as executor:
+        futures = {executor.submit(_fill_pdf_worker, config, schedules.get(config["scheduleName"].lower(), {}),
+                                   output_dir): config["scheduleName"] for config in roster}
+        for future in as_completed(futures):
+            try:
+                paths[futures[future]] = future.result()
+            except Exception as e:
+                logging.error(f"employee: {futures[future]} - failed: {e}")
+                paths[futures[future]] = None
+            else:
+                logging.info(f"employee: {futures[future]} - pdf saved on {paths[futures[future]]}")
+    return paths
 
 
 def create_template():
@@ -127,9 +197,12 @@ def configure_logging():
 
 if __name__ == "__main__":
     configure_logging()
-    options = int(input("Enter: \n1 - Create for input data file\n2 - Create pdf file\n").strip())
+    options = int(input("Enter: \n1 - Create for input data file\n2 - Create pdf file\n"
+                        "3 - Create pdf files of all employees of ./resources/roster.json\n").strip())
 
     if options == 1:
         create_template()
     if options == 2:
         write_pdf()
+    if options == 3:
+        write_pdfs()
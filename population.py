@@ -1,14 +1,28 @@
+import hashlib
+import json
+import logging
 import os
 import random
-from datetime import timedelta, datetime
+import tempfile
 
-import pandas as pd
+import numpy as np
 
-from evaluation.duplicate_employee_evaluation import DuplicateEmployeeEvaluation
-from evaluation.employee_of_week_evaluation import EmployeeOfWeekEvaluation
-from evaluation.employees_quantity_evaluation import EmployeeQuantityEvaluation
-from evaluation.more_than_7_days_evaluation import MoreThan7DaysEvaluation
-from evaluation.on_call_possible_evaluation import OnCallPossibleEvaluation
+from codebook import Codebook
+from exporters import EXPORTERS
+
+# Maximum number of times create_population creates a previous block again
+MAX_BACKTRACKS = 50
+
+
+def _days_per_block(number_of_employees: int, number_of_employees_doing_on_call: int):
+    # If the variable days is high (i.e. 7), on-call schedule is more stable
+    # it means the same person will do support in the whole week,
+    # but it becomes more difficult to find a schedule
+    days = os.getenv("DAYS")
+    if days is None:
+        should_split_week = number_of_employees - number_of_employees_doing_on_call == 1
+        return 3 if not should_split_week else 2
+    return int(days)
 
 
 def _sort_employees(employees: list):
@@ -35,16 +49,70 @@ def _select_next_employee(sorted_employees: list, employees: list, employees_of_
     return employee, sorted_employees
 
 
+def _select_employees_of_week(sorted_employees: list, employees: list, number_of_employees_doing_on_call: int,
+                              excluded_employees: list, blocked_employees: list):
+    # Selects the employees of a block. The slots are empty when there are no more available
+    # employees, it returns None when the remaining ones are blocked
+    employees_of_week = []
+    for employee_index in range(number_of_employees_doing_on_call):
+        if len(employees) - len(excluded_employees) <= employee_index:
+            employee = ""
+        elif len(set(excluded_employees + employees_of_week + blocked_employees)) >= len(employees):
+            return None, sorted_employees
+        else:
+            employee, sorted_employees = _select_next_employee(sorted_employees, employees,
+                                                               excluded_employees + employees_of_week +
+                                                               blocked_employees)
+        employees_of_week.append(employee)
+    return employees_of_week, sorted_employees
+
+
+def _too_many_days(on_call: np.ndarray, start: int, end: int):
+    # Returns which employees would do on-call on 8 of 9 days in a row (see MoreThan7DaysEvaluation)
+    # if they were also selected from start to end
+    history = on_call[max(0, start - 8):end].astype(np.int64)
+    history[start - max(0, start - 8):] = 1
+    cumulative = np.concatenate([np.zeros((1, history.shape[1]), dtype=np.int64), np.cumsum(history, axis=0)])
+    rows = np.arange(start - max(0, start - 8), history.shape[0])
+    windows = cumulative[rows + 1] - cumulative[np.maximum(rows - 8, 0)]
+    return (windows >= 8).any(axis=0)
+
+
 class Population:
-    def __init__(self, on_call_schedule: list, on_call_not_possible: dict, employees: list):
-        self.on_call_schedule = pd.DataFrame(on_call_schedule)
-        self.employees = employees
+    # The schedule is a (day x slot) array with the employee ids of the codebook.
+    # aggregates hold the partial results of the batch evaluation and parents the populations
+    # it was created from, so it can be evaluated from the aggregates of a parent
+    __slots__ = ("on_call_schedule", "codebook", "on_call_not_possible", "score", "invalid", "evaluation",
+                 "aggregates", "parents")
+
+    def __init__(self, on_call_schedule: np.ndarray, on_call_not_possible: np.ndarray, codebook: Codebook):
+        self.on_call_schedule = on_call_schedule
+        self.codebook = codebook
         self.score = None
         self.invalid = False
         self.on_call_not_possible = on_call_not_possible
         self.evaluation = None
+        self.aggregates = None
+        self.parents = None
+
+    @property
+    def employees(self):
+        return self.codebook.employees
+
+    def to_data_frame(self):
+        # Builds a DataFrame with the employee names of the schedule.
+        # pandas is only imported here, the GA runs on the arrays of BatchEvaluation
+        import pandas as pd
+
+        return pd.DataFrame(self.codebook.decode(self.on_call_schedule))
 
     def evaluate(self):
+        from evaluation.duplicate_employee_evaluation import DuplicateEmployeeEvaluation
+        from evaluation.employee_of_week_evaluation import EmployeeOfWeekEvaluation
+        from evaluation.employees_quantity_evaluation import EmployeeQuantityEvaluation
+        from evaluation.more_than_7_days_evaluation import MoreThan7DaysEvaluation
+        from evaluation.on_call_possible_evaluation import OnCallPossibleEvaluation
+
         self.evaluation = [DuplicateEmployeeEvaluation(self), EmployeeOfWeekEvaluation(self),
                            EmployeeQuantityEvaluation(self), MoreThan7DaysEvaluation(self),
                            OnCallPossibleEvaluation(self)]
@@ -54,67 +122,150 @@ class Population:
     def get_score_to_str(self):
         return ', '.join(e.get_score_to_str() for e in self.evaluation)
 
-    def save(self, start_date, name="result.csv"):
-        dates = [(start_date + timedelta(days=i)).strftime("%d/%m/%Y") for i in range(self.on_call_schedule.shape[0])]
-        day_of_week = [datetime.strptime(i, "%d/%m/%Y").date().strftime('%A') for i in dates]
+    def mutate(self, blocks: list):
+        # Replaces one employee of a random block by another employee who is
+        # available on that block and is not part of it yet
+        if not blocks:
+            return
+        start, end, candidates, slots = random.choice(blocks)
+        block = self.on_call_schedule[start:end]
+        candidates = np.setdiff1d(candidates, block)
+        if candidates.shape[0] > 0:
+            block[:, random.randrange(slots)] = random.choice(candidates)
 
-        self.on_call_schedule["Date"] = dates
-        self.on_call_schedule["Day Of Week"] = day_of_week
-        self.on_call_schedule.rename(inplace=True, columns={0: "On-Call 1", 1: "On-Call 2"})
-        self.on_call_schedule[["Date", "Day Of Week", "On-Call 1", "On-Call 2"]].to_csv(f"./resources/{name}",
-                                                                                        index=False)
+    def save(self, start_date, name="result.csv", output_dir="./resources", export_format="csv", possibilities=None,
+             roles=None):
+        # Streams the schedule on name with the exporter of export_format (see exporters.py)
+        EXPORTERS[export_format](os.path.join(output_dir, name), roles).export(self.on_call_schedule, self.codebook,
+                                                                               start_date, possibilities)
 
     @staticmethod
-    def create_population(employees: list, number_of_employees_doing_on_call: int, on_call_not_possible: dict,
-                          possibilities: list):
-        # Creates the on-call support schedule
-        schedule = []
+    def create_population(codebook: Codebook, number_of_employees_doing_on_call: int, on_call_not_possible: np.ndarray,
+                          possibilities: list, fixed_schedule=None, fixed_days=None):
+        # Creates the on-call support schedule block by block. An employee is not selected if it makes
+        # her/him do on-call for more than 7 days, when a block cannot be filled the previous one is
+        # created again (up to MAX_BACKTRACKS times, then the constraint is ignored).
+        # Each block fills its first p["slots"] slots of the number_of_employees_doing_on_call ones,
+        # the others are padding. The blocks on fixed_days are copied from fixed_schedule
+        employees = codebook.employees
+        blocks = Population.create_blocks(codebook, possibilities)
+        on_call = np.zeros((blocks[-1][1] if blocks else 0, len(employees)), dtype=np.int8)
+        if fixed_days is not None:
+            rows, slots = np.nonzero(fixed_days[:, np.newaxis] & (fixed_schedule < codebook.blank))
+            on_call[rows, fixed_schedule[rows, slots]] = 1
+        weeks = [None] * len(possibilities)
         sorted_employees = _sort_employees(employees)
+        backtracks = 0
+        index = 0
+        while index < len(possibilities):
+            p = possibilities[index]
+            start, end, _, slots = blocks[index]
+            padding = [None] * (number_of_employees_doing_on_call - slots)
+            if fixed_days is not None and fixed_days[start]:
+                weeks[index] = [""] * number_of_employees_doing_on_call
+                index += 1
+                continue
+            blocked_employees = []
+            if backtracks < MAX_BACKTRACKS:
+                too_many_days = _too_many_days(on_call, start, end)
+                blocked_employees = [e for e, blocked in zip(employees, too_many_days) if blocked]
+            employees_of_week, sorted_employees = _select_employees_of_week(
+                sorted_employees, employees, slots, p["excludedEmployees"], blocked_employees)
+
+            if employees_of_week is None and index > 0 and backtracks < MAX_BACKTRACKS and \
+                    (fixed_days is None or not fixed_days[blocks[index - 1][0]]):
+                backtracks += 1
+                index -= 1
+                on_call[blocks[index][0]:blocks[index][1]] = 0
+                sorted_employees = _sort_employees(employees)
+                continue
+            if employees_of_week is None:
+                employees_of_week, sorted_employees = _select_employees_of_week(
+                    sorted_employees, employees, slots, p["excludedEmployees"], [])
+
+            weeks[index] = employees_of_week + padding
+            on_call[start:end, [codebook.ids[e] for e in employees_of_week if e != ""]] = 1
+            index += 1
+        schedule = np.repeat(codebook.encode(weeks), [p["days"] for p in possibilities], axis=0)
+        if fixed_days is not None:
+            schedule[fixed_days] = fixed_schedule[fixed_days]
+        return Population(on_call_schedule=schedule, on_call_not_possible=on_call_not_possible, codebook=codebook)
+
+    @staticmethod
+    def create_blocks(codebook: Codebook, possibilities: list):
+        # Returns the first day, the day after the last one, the ids of the
+        # available employees and the number of slots of each possibility
+        blocks = []
+        start = 0
         for p in possibilities:
-            employees_of_week = []
-            for employee_index in range(number_of_employees_doing_on_call):
-                if len(employees) - len(p["excludedEmployees"]) == employee_index:
-                    employee = ""
-                else:
-                    employee, sorted_employees = _select_next_employee(sorted_employees, employees,
-                                                                       p["excludedEmployees"] + employees_of_week)
-                employees_of_week.append(employee)
-            for day in range(p["days"]):
-                schedule.append(employees_of_week)
-        return Population(on_call_schedule=schedule, on_call_not_possible=on_call_not_possible, employees=employees)
+            candidates = [codebook.ids[e] for e in codebook.employees if e not in p["excludedEmployees"]]
+            blocks.append((start, start + p["days"], np.array(candidates, dtype=codebook.dtype), p["slots"]))
+            start += p["days"]
+        return blocks
 
     @staticmethod
     def create_possibilities(number_of_employees_doing_on_call: int, employees: list, week_quantity: int,
-                             on_call_not_possible: dict):
+                             on_call_not_possible: np.ndarray, cache_dir=None, slots=None):
         # Creates a list of employees unavailable to do on-call support
-        # The list contains 2 fields:
+        # The list contains 3 fields:
         # excludedEmployees: a list of employees whom cannot do on-call on the next days
         # days: the amount of days, i.e. 3
-        should_split_week = len(employees) - number_of_employees_doing_on_call == 1
-        df_on_call_not_possible = pd.DataFrame(on_call_not_possible)
+        # slots: how many employees do on-call on these days, slots (one value per day) splits the
+        # blocks where it changes, without it every day has number_of_employees_doing_on_call
+        # The result is saved on cache_dir (if set) and reused for the same input
+        days, number_of_employees = on_call_not_possible.shape
+        if slots is None:
+            slots = np.full(days, number_of_employees_doing_on_call, dtype=np.int64)
+        max_days = _days_per_block(len(employees), number_of_employees_doing_on_call)
+        key = hashlib.sha256(json.dumps([number_of_employees_doing_on_call, employees, week_quantity, max_days,
+                                         on_call_not_possible.shape, slots.tolist()]).encode() +
+                             np.packbits(on_call_not_possible).tobytes()).hexdigest()
+        cache = os.path.join(cache_dir, f"possibilities-{key}.json") if cache_dir else None
+        if cache and os.path.exists(cache):
+            try:
+                with open(cache, "r") as f:
+                    return json.load(f)
+            except json.JSONDecodeError:
+                logging.warning(f"possibilities cache {cache} is not valid, it is created again")
+
+        # Days until the next day each employee is not available, from each day
+        not_possible_days = np.where(on_call_not_possible, np.arange(days).reshape(-1, 1), days + 7)
+        next_not_possible = np.minimum.accumulate(not_possible_days[::-1], axis=0)[::-1] - np.arange(days).reshape(-1, 1)
+        # A block can have up to number_of_employees - slots excluded employees, so the widest
+        # block from each day ends before the next not possible day of one employee more
+        max_excluded = number_of_employees - slots
+        widest = np.zeros(days, dtype=np.int64)
+        for value in np.unique(max_excluded):
+            rows = max_excluded == value
+            if value >= number_of_employees:
+                widest[rows] = 7
+            elif value >= 0:
+                widest[rows] = np.partition(next_not_possible[rows], value, axis=1)[:, value]
+        # First day with a different number of slots, from each day
+        changes = np.append(np.flatnonzero(np.diff(slots)) + 1, days)
+        next_change = changes[np.searchsorted(changes, np.arange(days), side="right")]
+
         possibilities = []
         for week in range(week_quantity):
             sum_days = 0
             while sum_days < 7:
-
-                # If the variable days is high (i.e. 7), on-call schedule is more stable
-                # it means the same person will do support in the whole week,
-                # but it becomes more difficult to find a schedule
-                days = os.getenv("DAYS")
-                if days is None:
-                    days = 3 if not should_split_week else 2
-                else:
-                    days = int(days)
-                columns = None
-                count = 0
-                while columns is None or (
-                        days - count > 0 and len(columns) + number_of_employees_doing_on_call > len(employees)):
-                    df = df_on_call_not_possible[(week * 7) + sum_days:(week * 7) + sum_days + days - count]
-                    columns = df.apply(pd.Series.value_counts, axis=1).drop(columns=[""]).columns.values
-                    count += 1
-                sum_days += days - count + 1
+                start = (week * 7) + sum_days
+                # The last block of the week ends on the last day of the week
+                block_days = max(1, min(max_days, 7 - sum_days, int(widest[start]), int(next_change[start]) - start))
+                excluded = next_not_possible[start] < block_days
+                sum_days += block_days
                 possibilities.append({
-                    "excludedEmployees": list(columns),
-                    "days": days - count + 1
+                    "excludedEmployees": [employee for employee, e in zip(employees, excluded) if e],
+                    "days": block_days,
+                    "slots": int(slots[start])
                 })
+
+        if cache:
+            # Several processes can write the same file, each one writes its own temporary file
+            # and the cache is replaced only when it is complete
+            os.makedirs(cache_dir, exist_ok=True)
+            descriptor, path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(descriptor, "w") as f:
+                f.write(json.dumps(possibilities))
+            os.replace(path, cache)
         return possibilities
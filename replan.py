@@ -0,0 +1,72 @@
+import logging
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from codebook import Codebook
+
+
+def load_schedule(config: dict, path: str, codebook: Codebook, slots=None):
+    # Reads a result saved by Population.save and returns a (day x slot) array with the ids of the
+    # codebook for the days of the template and a boolean array with the days found on the file.
+    # The slots a day does not have (see main.map_on_call_slots) are padding
+    number_of_employees_doing_on_call = config["numberOfEmployeesDoingOnCall"] if slots is None else int(slots.max())
+    start_date = datetime.strptime(config["startDate"], "%d/%m/%Y").date()
+    days = 7 * config["weekQuantity"]
+
+    result = pd.read_csv(path, dtype=str, keep_default_na=False)
+    columns = [column for column in result.columns if column.startswith("On-Call")]
+    if len(columns) != number_of_employees_doing_on_call:
+        raise ValueError(f"{path} has {len(columns)} on-call columns, the template has "
+                         f"{number_of_employees_doing_on_call}")
+
+    schedule = np.full((days, number_of_employees_doing_on_call), codebook.blank, dtype=codebook.dtype)
+    known = np.zeros(days, dtype=bool)
+    for result_date, names in zip(result["Date"], result[columns].values):
+        day = (datetime.strptime(result_date, "%d/%m/%Y").date() - start_date).days
+        if not 0 <= day < days:
+            continue
+        names = [name.strip().lower() for name in names]
+        unknown = [name for name in names if name not in codebook.ids]
+        if unknown:
+            raise ValueError(f"{path} has employees which are not on the template: {unknown}")
+        schedule[day] = [codebook.ids[name] for name in names]
+        known[day] = True
+    if slots is not None:
+        schedule[np.arange(number_of_employees_doing_on_call) >= slots.reshape(-1, 1)] = codebook.padding
+    return schedule, known
+
+
+def select_fixed_days(config: dict, schedule: np.ndarray, known: np.ndarray, on_call_not_possible: np.ndarray,
+                      codebook: Codebook, published_weeks=0, margin=1, today=None):
+    # Returns the days of schedule which are kept by the re-planning, by whole weeks.
+    # The weeks already started (today included) and the first published_weeks weeks are frozen, so the
+    # days already done are never changed. The other weeks
+    # are re-planned when an employee of the schedule is not available anymore, together with the
+    # margin weeks around them so the schedule can change across the seams, or when they are not
+    # on the schedule. The remaining weeks are kept as well
+    start_date = datetime.strptime(config["startDate"], "%d/%m/%Y").date()
+    today = today or date.today()
+    days, _ = on_call_not_possible.shape
+    weeks = days // 7
+
+    conflicts = np.zeros(days, dtype=bool)
+    rows, slots = np.nonzero(schedule < codebook.blank)
+    conflicts[rows[on_call_not_possible[rows, schedule[rows, slots]]]] = True
+    conflict_weeks = conflicts.reshape(weeks, 7).any(axis=1)
+
+    started_weeks = min(weeks, (today - start_date).days // 7 + 1) if today >= start_date else 0
+    frozen_weeks = np.arange(weeks) < max(started_weeks, published_weeks)
+    if (conflict_weeks & frozen_weeks).any():
+        logging.warning(f"weeks {np.flatnonzero(conflict_weeks & frozen_weeks).tolist()} are frozen "
+                        f"but have employees not available anymore")
+
+    # A week is affected when a week of conflict is at most margin weeks away
+    affected = np.array([conflict_weeks[max(0, week - margin):week + margin + 1].any() for week in range(weeks)],
+                        dtype=bool)
+    unknown_weeks = ~known.reshape(weeks, 7).all(axis=1)
+    replanned_weeks = ~frozen_weeks & (affected | unknown_weeks)
+    logging.info(f"frozen weeks: {np.flatnonzero(frozen_weeks).tolist()} - "
+                 f"re-planned weeks: {np.flatnonzero(replanned_weeks).tolist()}")
+    return np.repeat(~replanned_weeks, 7)
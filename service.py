@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+from main import ENGINES, configure_logging, save_result, solve
+
+# Seconds between two reads of the metrics of a job streamed by /jobs/<id>/events
+EVENTS_INTERVAL = 0.2
+# Template keys with a path the service would write on, the files of a job are only written on its directory
+PATH_KEYS = ["profile", "history"]
+
+
+def _warm_worker():
+    # Imports the heavy modules once per worker, so the jobs do not pay for them
+    logging.getLogger().setLevel(logging.WARNING)
+    import generation  # noqa: F401
+    import pdf_writer  # noqa: F401
+    import pypdf  # noqa: F401
+
+
+def _ready():
+    return os.getpid()
+
+
+def run_job(job_dir: str, config: dict, engine: str, personal_data: dict):
+    # Solves the template of a job in a worker process, the measurements of each epoch are written on
+    # metrics.jsonl of job_dir and the result on result.csv (and the timesheet pdf with personal_data)
+    open(os.path.join(job_dir, "started"), "w").close()
+    # Every job runs on one worker and the checkpoint file would be shared by the jobs.
+    # The jobs do not write outside job_dir, so there is no profile and no history
+    config.update({"islands": 1, "checkpointInterval": 0, "metrics": os.path.join(job_dir, "metrics.jsonl"),
+                   "metricsFormat": "jsonl", "profile": None, "history": None})
+    engine, best_population, best_invalid_population, seconds = solve(config, engine)
+    save_result(config, best_population, best_invalid_population, "result.csv", job_dir)
+    population = best_population or best_invalid_population
+    summary = {
+        "score": None if population is None else float(population.score),
+        "valid": best_population is not None,
+        "seconds": seconds,
+        "epochs": engine.epochs,
+        "stop_reason": engine.stop_reason,
+        "result": None if population is None else os.path.join(
+            job_dir, "result.csv" if best_population else "invalid-result.csv"),
+        "pdf": None
+    }
+    if personal_data and best_population is not None:
+        from pdf_writer import write_pdf
+        summary["pdf"] = write_pdf(personal_data, summary["result"], job_dir)
+    return summary
+
+
+class Job:
+    def __init__(self, job_id: str, job_dir: str):
+        self.id = job_id
+        self.dir = job_dir
+        self.future = None
+
+    def status(self):
+        if self.future is None or not self.future.done():
+            started = os.path.exists(os.path.join(self.dir, "started"))
+            return {"id": self.id, "status": "running" if started else "queued"}
+        if self.future.exception() is not None:
+            return {"id": self.id, "status": "failed", "error": repr(self.future.exception())}
+        return {"id": self.id, "status": "done", **self.future.result()}
+
+
+class Service:
+    # Local HTTP service that solves templates on a pool of warm worker processes:
+    # POST /jobs                   template json, or {"template": ..., "engine": ..., "personalData": ...}
+    # GET  /jobs/<id>              status of the job and, when it is done, its summary
+    # GET  /jobs/<id>/events       metrics of each epoch as json lines until the job is done
+    # GET  /jobs/<id>/result.csv   schedule of the job
+    # GET  /jobs/<id>/result.pdf   timesheet of the job, when it was created with personalData
+    def __init__(self, jobs_dir: str, workers: int):
+        self.jobs_dir = jobs_dir
+        self.workers = workers
+        self.executor = None
+        self.jobs = {}
+
+    async def start(self, host: str, port: int):
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(*[loop.run_in_executor(self.executor, _ready) for _ in range(self.workers)])
+        logging.info(f"{len(set(pids))} workers ready")
+        server = await asyncio.start_server(self.handle, host, port)
+        logging.info(f"listening on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+
+    def submit(self, body: dict):
+        if not isinstance(body, dict):
+            raise ValueError("the body must be a json object")
+        template = body.get("template", body)
+        engine = body.get("engine")
+        if not isinstance(template, dict):
+            raise ValueError("the template must be a json object")
+        if "employeeNames" not in template or "startDate" not in template:
+            raise ValueError("the template must have employeeNames and startDate")
+        paths = [key for key in PATH_KEYS if template.get(key)]
+        if paths:
+            raise ValueError(f"the service does not write on the paths of the template: {paths}")
+        if engine is not None and (not isinstance(engine, str) or engine not in ENGINES):
+            raise ValueError(f"engine must be one of {list(ENGINES)}, not {engine}")
+
+        job_id = uuid.uuid4().hex
+        job = Job(job_id, os.path.join(self.jobs_dir, job_id))
+        os.makedirs(job.dir)
+        with open(os.path.join(job.dir, "template.json"), "w") as f:
+            f.write(json.dumps(template, indent=2))
+        job.future = asyncio.get_running_loop().run_in_executor(self.executor, run_job, job.dir, template, engine,
+                                                                body.get("personalData"))
+        self.jobs[job.id] = job
+        logging.info(f"job {job.id} queued")
+        return job
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, path, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+            headers = {}
+            while (line := (await reader.readline()).decode("latin-1").strip()):
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            await self.route(method, path.split("?")[0].rstrip("/"), body, writer)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            await self.respond(writer, HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter):
+        parts = path.strip("/").split("/")
+        if method == "POST" and parts == ["jobs"]:
+            job = self.submit(json.loads(body or b"{}"))
+            return await self.respond(writer, HTTPStatus.ACCEPTED, job.status())
+
+        job = self.jobs.get(parts[1]) if len(parts) >= 2 and parts[0] == "jobs" else None
+        if method != "GET" or job is None or len(parts) > 3:
+            return await self.respond(writer, HTTPStatus.NOT_FOUND, {"error": f"{method} {path} not found"})
+        if len(parts) == 2:
+            return await self.respond(writer, HTTPStatus.OK, job.status())
+        if parts[2] == "events":
+            return await self.stream_events(job, writer)
+
+        status = job.status()
+        files = {"result.csv": ("result", "text/csv"), "result.pdf": ("pdf", "application/pdf")}
+        if parts[2] not in files:
+            return await self.respond(writer, HTTPStatus.NOT_FOUND, {"error": f"{method} {path} not found"})
+        key, content_type = files[parts[2]]
+        if status.get(key) is None:
+            return await self.respond(writer, HTTPStatus.CONFLICT, status)
+        with open(status[key], "rb") as f:
+            await self.respond(writer, HTTPStatus.OK, f.read(), content_type)
+
+    async def stream_events(self, job: Job, writer: asyncio.StreamWriter):
+        # Sends the lines of metrics.jsonl as they are written and the status of the job at the end
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nConnection: close\r\n\r\n")
+        path = os.path.join(job.dir, "metrics.jsonl")
+        offset = 0
+        while True:
+            done = job.future.done()
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    lines = f.read()
+                # Only complete lines are sent, the last one can still be written
+                lines = lines[:lines.rfind(b"\n") + 1]
+                offset += len(lines)
+                writer.write(lines)
+                await writer.drain()
+            if done:
+                break
+            await asyncio.sleep(EVENTS_INTERVAL)
+        writer.write(json.dumps(job.status()).encode() + b"\n")
+        await writer.drain()
+
+    @staticmethod
+    async def respond(writer: asyncio.StreamWriter, status: HTTPStatus, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local HTTP service that solves on-call templates")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of templates solved in parallel")
+    parser.add_argument("--jobs-dir", default="./resources/jobs", help="directory of the files of each job")
+    args = parser.parse_args()
+
+    configure_logging()
+    try:
+        asyncio.run(Service(args.jobs_dir, args.workers).start(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from population import Population
+
+EMPLOYEES = ["paul", "emma", "ben", "finn", "leon", "mia"]
+DAYS = 21
+
+
+def random_populations(rng, codebook, on_call_not_possible, width, quantity=30):
+    # Schedules with random employees, empty slots, duplicated employees on any slot
+    # and padding on the days with fewer employees doing on-call
+    slots = rng.integers(1, width + 1, DAYS)
+    populations = []
+    for _ in range(quantity):
+        schedule = rng.integers(0, codebook.blank + 1, (DAYS, width)).astype(codebook.dtype)
+        schedule[np.arange(width) >= slots.reshape(-1, 1)] = codebook.padding
+        populations.append(Population(schedule, on_call_not_possible, codebook))
+    return populations
+
+
+def children_of(rng, parents, codebook, max_changed_days=3):
+    # Children changing one to max_changed_days days of their parent
+    children = []
+    for parent in parents:
+        schedule = parent.on_call_schedule.copy()
+        for day in rng.choice(DAYS, rng.integers(1, max_changed_days + 1), replace=False):
+            active = schedule[day] != codebook.padding
+            schedule[day, active] = rng.integers(0, codebook.blank + 1, active.sum())
+        child = Population(schedule, parent.on_call_not_possible, codebook)
+        child.parents = (parent,)
+        children.append(child)
+    return children
+
+
+def copy(populations):
+    return [Population(p.on_call_schedule.copy(), p.on_call_not_possible, p.codebook) for p in populations]
+
+
+def assert_same_scores(populations, expected):
+    for population, reference in zip(populations, expected):
+        assert [e.score for e in population.evaluation] == pytest.approx([e.score for e in reference.evaluation])
+        assert [e.invalid for e in population.evaluation] == [e.invalid for e in reference.evaluation]
+        assert population.score == pytest.approx(reference.score)
+        assert population.invalid == reference.invalid
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from codebook import Codebook
+from evaluation.batch_evaluation import BatchEvaluation
+from schedules import EMPLOYEES, DAYS, assert_same_scores, copy, random_populations
+
+
+@pytest.mark.parametrize("width", [1, 2, 3])
+def test_batch_matches_population_evaluate(width):
+    rng = np.random.default_rng(7)
+    codebook = Codebook(EMPLOYEES)
+    on_call_not_possible = rng.random((DAYS, len(EMPLOYEES))) < 0.1
+    populations = random_populations(rng, codebook, on_call_not_possible, width)
+    BatchEvaluation(codebook, on_call_not_possible, 0, 0).evaluate(populations)
+
+    references = copy(populations)
+    for reference in references:
+        reference.evaluate()
+    assert_same_scores(populations, references)
@@ -0,0 +1,53 @@
+import random
+
+import numpy as np
+import pytest
+
+from convergence import Convergence
+from generation import Generation
+
+EMPLOYEES = ["paul", "emma", "ben", "finn", "leon", "mia"]
+WEEKS = 6
+EPOCHS = 10
+
+
+def create_generation(seed: int):
+    random.seed(seed)
+    on_call_not_possible = np.random.default_rng(3).random((7 * WEEKS, len(EMPLOYEES))) < 0.1
+    return Generation.create_generation(20, 2, EMPLOYEES, WEEKS, on_call_not_possible)
+
+
+def convergence():
+    # The target score is never reached and the mutation rate is boosted after each epoch without improvement
+    return Convergence(target_score=101, stall_epochs=1, mutation_boost=2)
+
+
+def test_resumed_run_equals_an_uninterrupted_run(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.npz")
+    generation = create_generation(7)
+    best_population, _ = generation.run(2 * EPOCHS, convergence=convergence())
+
+    interrupted = create_generation(7)
+    interrupted.run(EPOCHS, checkpoint=checkpoint, checkpoint_interval=EPOCHS, convergence=convergence())
+    # Another seed, everything comes from the checkpoint
+    resumed = create_generation(8)
+    resumed_convergence = convergence()
+    best_resumed, invalid_resumed = resumed.load_checkpoint(checkpoint, resumed_convergence)
+    assert resumed.epoch == EPOCHS
+    best_resumed, _ = resumed.run(2 * EPOCHS, best_resumed, invalid_resumed, convergence=resumed_convergence)
+
+    assert resumed.epoch == generation.epoch
+    assert (best_resumed is None) == (best_population is None)
+    if best_population is not None:
+        assert np.array_equal(best_resumed.on_call_schedule, best_population.on_call_schedule)
+    for population, resumed_population in zip(generation.populations, resumed.populations):
+        assert np.array_equal(population.on_call_schedule, resumed_population.on_call_schedule)
+
+
+def test_checkpoint_of_another_template_is_rejected(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.npz")
+    create_generation(7).run(1, checkpoint=checkpoint, checkpoint_interval=1)
+    other = create_generation(7)
+    other.employees = other.employees[::-1]
+    with pytest.raises(ValueError):
+        other.load_checkpoint(checkpoint)
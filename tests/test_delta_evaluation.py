@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+import evaluation.batch_evaluation as batch_evaluation
+from codebook import Codebook
+from evaluation.batch_evaluation import BatchEvaluation
+from population import Population
+from schedules import EMPLOYEES, DAYS, assert_same_scores, children_of, copy, random_populations
+
+
+@pytest.fixture
+def deltas(monkeypatch):
+    # Every child is evaluated from its parent, whatever the size of the schedule.
+    # Returns the populations evaluated by the delta evaluation
+    monkeypatch.setattr(batch_evaluation, "DELTA_MIN_CELLS", 0)
+    populations = []
+    evaluate_delta = BatchEvaluation._evaluate_delta
+    monkeypatch.setattr(BatchEvaluation, "_evaluate_delta",
+                        lambda self, *args: populations.append(args[0]) or evaluate_delta(self, *args))
+    return populations
+
+
+@pytest.mark.parametrize("width", [1, 2, 3])
+def test_delta_matches_full(deltas, width):
+    rng = np.random.default_rng(11)
+    codebook = Codebook(EMPLOYEES)
+    on_call_not_possible = rng.random((DAYS, len(EMPLOYEES))) < 0.1
+    evaluation = BatchEvaluation(codebook, on_call_not_possible, 0, 0)
+    parents = random_populations(rng, codebook, on_call_not_possible, width)
+    evaluation.evaluate(parents)
+
+    children = children_of(rng, parents, codebook)
+    deltas.clear()
+    evaluation.evaluate(children)
+    assert len(deltas) == len(children)
+
+    full = copy(children)
+    BatchEvaluation(codebook, on_call_not_possible, 0, 0).evaluate(full)
+    assert_same_scores(children, full)
+
+
+def test_many_changes_are_evaluated_in_full(deltas):
+    rng = np.random.default_rng(13)
+    codebook = Codebook(EMPLOYEES)
+    on_call_not_possible = np.zeros((DAYS, len(EMPLOYEES)), dtype=bool)
+    evaluation = BatchEvaluation(codebook, on_call_not_possible, 0, 0)
+    parents = random_populations(rng, codebook, on_call_not_possible, 2, quantity=5)
+    evaluation.evaluate(parents)
+
+    children = []
+    for parent in parents:
+        schedule = parent.on_call_schedule.copy()
+        schedule[:DAYS // 2] = schedule[:DAYS // 2, ::-1]
+        child = Population(schedule, on_call_not_possible, codebook)
+        child.parents = (parent,)
+        children.append(child)
+    deltas.clear()
+    evaluation.evaluate(children)
+    assert not deltas
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import evaluation.batch_evaluation as batch_evaluation
+from codebook import Codebook
+from evaluation.batch_evaluation import BatchEvaluation
+from evaluation.lru_cache import LruCache
+from schedules import EMPLOYEES, DAYS, assert_same_scores, children_of, copy, random_populations
+
+
+def test_lru_cache_evicts_the_least_recently_used():
+    cache = LruCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
+
+
+def test_disabled_cache_stores_nothing():
+    cache = LruCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.parametrize("week_cache_size", [0, 64])
+def test_cached_schedules_have_the_same_scores(week_cache_size):
+    rng = np.random.default_rng(17)
+    codebook = Codebook(EMPLOYEES)
+    on_call_not_possible = rng.random((DAYS, len(EMPLOYEES))) < 0.1
+    evaluation = BatchEvaluation(codebook, on_call_not_possible, 256, week_cache_size)
+    populations = random_populations(rng, codebook, on_call_not_possible, 2)
+    # The same schedules twice on the same batch
+    populations += copy(populations[:5])
+    evaluation.evaluate(populations)
+    assert evaluation.fitness_cache.stats()["misses"] == len(populations) - 5
+    assert evaluation.fitness_cache.stats()["entries"] == len(populations) - 5
+
+    full = copy(populations)
+    BatchEvaluation(codebook, on_call_not_possible, 0, 0).evaluate(full)
+    assert_same_scores(populations, full)
+
+    cached = copy(populations)
+    evaluation.evaluate(cached)
+    assert evaluation.fitness_cache.stats()["hits"] == len(cached)
+    assert_same_scores(cached, full)
+
+
+@pytest.mark.parametrize("width", [1, 3])
+def test_week_cache_on_the_delta_evaluation(monkeypatch, width):
+    monkeypatch.setattr(batch_evaluation, "DELTA_MIN_CELLS", 0)
+    rng = np.random.default_rng(19)
+    codebook = Codebook(EMPLOYEES)
+    on_call_not_possible = rng.random((DAYS, len(EMPLOYEES))) < 0.1
+    evaluation = BatchEvaluation(codebook, on_call_not_possible, 0, 64)
+    parents = random_populations(rng, codebook, on_call_not_possible, width)
+    evaluation.evaluate(parents)
+    children = children_of(rng, parents, codebook)
+    evaluation.evaluate(children)
+    full = copy(children)
+    BatchEvaluation(codebook, on_call_not_possible, 0, 0).evaluate(full)
+    assert_same_scores(children, full)
+
+    # The weeks of the same children again come from the week cache
+    children_again = copy(children)
+    for child, parent in zip(children_again, parents):
+        child.parents = (parent,)
+    hits = evaluation.week_cache.stats()["hits"]
+    evaluation.evaluate(children_again)
+    assert evaluation.week_cache.stats()["hits"] > hits
+    assert_same_scores(children_again, full)
@@ -0,0 +1,62 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+import evaluation.batch_evaluation as batch_evaluation
+from codebook import Codebook
+from evaluation.batch_evaluation import BatchEvaluation
+from evaluation.history_fairness_evaluation import HistoryFairnessEvaluation
+from history import History, HistoryStore, day_weights
+from schedules import EMPLOYEES, DAYS, assert_same_scores, children_of, copy, random_populations
+
+
+def test_day_weights():
+    # 05/01/2024 is a Friday and a holiday, 06/01/2024 a Saturday and a holiday
+    weights = day_weights(date(2024, 1, 4), 5, weekend_weight=1.5, holiday_weight=2,
+                          holidays=["05/01/2024", "06/01/2024"])
+    assert weights.tolist() == [1, 2, 2, 1.5, 1]
+
+
+def test_store_replaces_the_days_recorded_again(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite"))
+    store.record(np.array([["paul", "emma"], ["paul", ""]], dtype=object), date(2024, 1, 1), np.array([1, 2]))
+    store.record(np.array([["ben", "emma"]], dtype=object), date(2024, 1, 2), np.array([1.5]))
+    assert store.load(["paul", "emma", "ben"], date(2024, 2, 1)).tolist() == [1, 2.5, 1.5]
+    assert store.load(["paul", "emma", "ben"], date(2024, 1, 2)).tolist() == [1, 1, 0]
+    assert store.load(["paul", "emma", "ben"], date(2024, 2, 1), since=date(2024, 1, 2)).tolist() == [0, 1.5, 1.5]
+
+
+def test_tolerance_must_be_positive():
+    with pytest.raises(ValueError):
+        History(np.zeros(2), np.ones(7), tolerance=0)
+
+
+@pytest.mark.parametrize("width", [1, 2, 3])
+def test_batch_matches_history_fairness_evaluation(width):
+    rng = np.random.default_rng(23)
+    codebook = Codebook(EMPLOYEES)
+    on_call_not_possible = np.zeros((DAYS, len(EMPLOYEES)), dtype=bool)
+    history = History(rng.random(len(EMPLOYEES)) * 10, 1 + rng.random(DAYS), tolerance=3)
+    populations = random_populations(rng, codebook, on_call_not_possible, width)
+    BatchEvaluation(codebook, on_call_not_possible, 0, 0, history).evaluate(populations)
+
+    for population in populations:
+        assert population.evaluation[2].score == pytest.approx(HistoryFairnessEvaluation(population, history).evaluate())
+
+
+def test_delta_evaluation_with_history(monkeypatch):
+    monkeypatch.setattr(batch_evaluation, "DELTA_MIN_CELLS", 0)
+    rng = np.random.default_rng(29)
+    codebook = Codebook(EMPLOYEES)
+    on_call_not_possible = rng.random((DAYS, len(EMPLOYEES))) < 0.1
+    history = History(rng.random(len(EMPLOYEES)), 1 + rng.random(DAYS))
+    evaluation = BatchEvaluation(codebook, on_call_not_possible, 0, 0, history)
+    parents = random_populations(rng, codebook, on_call_not_possible, 2)
+    evaluation.evaluate(parents)
+    children = children_of(rng, parents, codebook)
+    evaluation.evaluate(children)
+
+    full = copy(children)
+    BatchEvaluation(codebook, on_call_not_possible, 0, 0, history).evaluate(full)
+    assert_same_scores(children, full)
@@ -0,0 +1,25 @@
+from main import map_on_call_not_possible
+
+
+def config(**days):
+    # A template of one week from 01/01/2024, days maps the day of the month to the unavailable employees
+    template = {"startDate": "01/01/2024", "weekQuantity": 1, "employeeNames": ["Ben", "Benjamin", "Emma"]}
+    template.update({f"{day:02d}/01/2024": days.get(f"day_{day}", "") for day in range(1, 8)})
+    return template
+
+
+def test_names_match_exactly():
+    on_call_not_possible = map_on_call_not_possible(config(day_1="Benjamin", day_2="ben"))
+    assert on_call_not_possible[0].tolist() == [False, True, False]
+    assert on_call_not_possible[1].tolist() == [True, False, False]
+
+
+def test_whitespace_around_the_names():
+    on_call_not_possible = map_on_call_not_possible(config(day_3=" Emma ,  benjamin,Ben "))
+    assert on_call_not_possible[2].tolist() == [True, True, True]
+    assert not on_call_not_possible[[0, 1, 3, 4, 5, 6]].any()
+
+
+def test_unknown_names_are_ignored():
+    on_call_not_possible = map_on_call_not_possible(config(day_4="Paul, Be"))
+    assert not on_call_not_possible.any()
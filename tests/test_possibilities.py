@@ -0,0 +1,79 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from population import Population
+
+
+def reference_possibilities(number_of_employees_doing_on_call: int, employees: list, week_quantity: int,
+                            on_call_not_possible: np.ndarray):
+    # The implementation before the next not possible day index, it shrinks each block
+    # one day at a time until enough employees are available
+    should_split_week = len(employees) - number_of_employees_doing_on_call == 1
+    possibilities = []
+    for week in range(week_quantity):
+        sum_days = 0
+        while sum_days < 7:
+            days = os.getenv("DAYS")
+            days = (3 if not should_split_week else 2) if days is None else int(days)
+            days = min(days, 7 - sum_days)
+            columns = None
+            count = 0
+            while columns is None or (
+                    days - count > 0 and len(columns) + number_of_employees_doing_on_call > len(employees)):
+                start = (week * 7) + sum_days
+                excluded = on_call_not_possible[start:start + days - count].any(axis=0)
+                columns = [employee for employee, e in zip(employees, excluded) if e]
+                count += 1
+            sum_days += days - count + 1
+            possibilities.append({"excludedEmployees": list(columns), "days": days - count + 1})
+    return possibilities
+
+
+@pytest.mark.parametrize("days", [None, "2", "3", "7"])
+def test_same_blocks_as_the_reference(monkeypatch, days):
+    if days is None:
+        monkeypatch.delenv("DAYS", raising=False)
+    else:
+        monkeypatch.setenv("DAYS", days)
+    rng = np.random.default_rng(31)
+    for _ in range(400):
+        number_of_employees = int(rng.integers(2, 9))
+        number_of_employees_doing_on_call = int(rng.integers(1, number_of_employees + 1))
+        week_quantity = int(rng.integers(1, 5))
+        employees = [f"employee {index}" for index in range(number_of_employees)]
+        on_call_not_possible = rng.random((7 * week_quantity, number_of_employees)) < rng.random()
+        possibilities = Population.create_possibilities(number_of_employees_doing_on_call, employees, week_quantity,
+                                                        on_call_not_possible)
+        assert [{"excludedEmployees": p["excludedEmployees"], "days": p["days"]} for p in possibilities] == \
+            reference_possibilities(number_of_employees_doing_on_call, employees, week_quantity, on_call_not_possible)
+        assert all(p["slots"] == number_of_employees_doing_on_call for p in possibilities)
+
+
+def create(cache_dir):
+    on_call_not_possible = np.zeros((14, 4), dtype=bool)
+    on_call_not_possible[3, 1] = True
+    return Population.create_possibilities(2, ["paul", "emma", "ben", "finn"], 2, on_call_not_possible,
+                                           cache_dir=str(cache_dir))
+
+
+def test_cache_hit(tmp_path):
+    possibilities = create(tmp_path)
+    [cache] = os.listdir(tmp_path)
+    # The second call reads the file instead of planning the blocks again
+    with open(tmp_path / cache, "w") as f:
+        json.dump(possibilities[:1], f)
+    assert create(tmp_path) == possibilities[:1]
+
+
+def test_corrupt_cache_is_created_again(tmp_path):
+    possibilities = create(tmp_path)
+    [cache] = os.listdir(tmp_path)
+    with open(tmp_path / cache, "w") as f:
+        f.write(json.dumps(possibilities)[:20])
+    assert create(tmp_path) == possibilities
+    assert os.listdir(tmp_path) == [cache]
+    with open(tmp_path / cache) as f:
+        assert json.load(f) == possibilities
@@ -0,0 +1,48 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from codebook import Codebook
+from replan import select_fixed_days
+
+CONFIG = {"startDate": "01/01/2024"}
+WEEKS = 4
+
+
+def fixed_weeks(conflict_day: int, today: date, published_weeks=0):
+    # Returns which weeks select_fixed_days keeps when the first employee of the
+    # schedule is not available anymore on conflict_day
+    codebook = Codebook(["paul", "emma", "ben"])
+    schedule = np.tile(np.array([0, 1], dtype=codebook.dtype), (7 * WEEKS, 1))
+    on_call_not_possible = np.zeros((7 * WEEKS, 3), dtype=bool)
+    on_call_not_possible[conflict_day, 0] = True
+    known = np.ones(7 * WEEKS, dtype=bool)
+    fixed_days = select_fixed_days(CONFIG, schedule, known, on_call_not_possible, codebook,
+                                   published_weeks=published_weeks, margin=1, today=today)
+    weeks = fixed_days.reshape(WEEKS, 7)
+    assert (weeks == weeks[:, :1]).all()
+    return weeks[:, 0].tolist()
+
+
+@pytest.mark.parametrize("today, expected", [
+    # before the start nothing is done yet
+    (date(2023, 12, 20), [False, False, True, True]),
+    # Thursday of the first week: the days already done of the week are kept
+    (date(2024, 1, 4), [True, False, True, True]),
+    # Sunday of the first week is still a day of the first week
+    (date(2024, 1, 7), [True, False, True, True]),
+    # after the last week everything is kept
+    (date(2024, 3, 1), [True, True, True, True]),
+])
+def test_started_weeks_are_frozen(today, expected):
+    assert fixed_weeks(2, today) == expected
+
+
+def test_seam_of_a_started_week_is_frozen():
+    # The conflict is on the third week and today is on the second one, which is a seam of the conflict
+    assert fixed_weeks(16, date(2024, 1, 10)) == [True, True, False, False]
+
+
+def test_published_weeks_are_frozen():
+    assert fixed_weeks(9, date(2023, 12, 20), published_weeks=2) == [True, True, False, True]